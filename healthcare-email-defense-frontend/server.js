@@ -174,6 +174,8 @@ async function applyLearningFromVerdict(item, verdict, actor, ts, notes) {
       // Lambda will ignore empty string.
       notes: notes || "" 
     };
+    // Sparse key for the feedback agent's notes-index GSI
+    if (String(notes || "").trim()) feedbackItem.has_notes = "1";
 
     await dynamo
       .put({
@@ -234,6 +236,7 @@ app.get("/api/hitl/pending", async (req, res) => {
           
           const senderRiskNotes = 
             doc.summary?.sender_risk_notes || 
+            doc.sender_intel?.features?.risk?.notes || 
             doc.sender_intel?.raw?.features?.risk?.notes || 
             [];
 
@@ -567,10 +570,12 @@ app.post("/api/hitl/report", async (req, res) => {
 
     const fromAddr =
       doc.compact?.from?.addr ||
+      doc.sender_intel?.ids?.from_addr ||
       doc.sender_intel?.raw?.ids?.from_addr ||
       "unknown";
 
     const fromDomain =
+      doc.sender_intel?.ids?.from_domain ||
       doc.sender_intel?.raw?.ids?.from_domain ||
       (fromAddr.includes("@") ? fromAddr.split("@")[1] : "unknown");
 
@@ -591,6 +596,7 @@ app.post("/api/hitl/report", async (req, res) => {
 
     const queueId =
       run_id ||
+      doc.sender_intel?.ids?.message_id ||
       doc.sender_intel?.raw?.ids?.message_id ||
       doc.compact?.message_id ||
       s3_key;
@@ -1045,6 +1051,7 @@ app.get("/api/history", async (req, res) => {
           }
 
           const runId =
+            body.sender_intel?.ids?.message_id ||
             body.sender_intel?.raw?.ids?.message_id ||
             body.compact?.message_id ||
             obj.Key;
@@ -1054,6 +1061,7 @@ app.get("/api/history", async (req, res) => {
           
           const senderRiskNotes = 
             body.summary?.sender_risk_notes || 
+            body.sender_intel?.features?.risk?.notes || 
             body.sender_intel?.raw?.features?.risk?.notes || 
             [];
 
@@ -1183,6 +1191,8 @@ app.post("/api/history/feedback", async (req, res) => {
       created_ts: ts,
       source: "history_review"
     };
+    // Sparse key for the feedback agent's notes-index GSI
+    if (safeNotes.trim()) feedbackItem.has_notes = "1";
 
     await dynamo.put({ TableName: FEEDBACK_TABLE, Item: feedbackItem }).promise();
 
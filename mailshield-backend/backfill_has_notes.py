@@ -0,0 +1,46 @@
+"""
+One-time backfill for the feedback table's sparse notes-index GSI.
+
+The dashboard sets has_notes="1" on feedback rows whose notes are non-blank,
+and the feedback agent reads notes through that index. Rows written before
+has_notes existed are invisible to the index until this has run. Safe to
+re-run: only rows with notes and no has_notes are touched.
+
+Usage: python3 backfill_has_notes.py [TABLE_NAME]
+"""
+import sys
+
+import boto3
+
+FEEDBACK_TABLE = sys.argv[1] if len(sys.argv) > 1 else "sender_feedback_table"
+
+
+def main():
+    dynamo = boto3.client("dynamodb")
+    paginator = dynamo.get_paginator("scan")
+    updated = 0
+    for page in paginator.paginate(
+        TableName=FEEDBACK_TABLE,
+        FilterExpression="attribute_exists(notes) AND attribute_not_exists(has_notes)",
+        ProjectionExpression="pk, sk, notes",
+    ):
+        for item in page.get("Items", []):
+            if not item.get("notes", {}).get("S", "").strip():
+                continue
+            try:
+                dynamo.update_item(
+                    TableName=FEEDBACK_TABLE,
+                    Key={"pk": item["pk"], "sk": item["sk"]},
+                    UpdateExpression="SET has_notes = :one",
+                    # Don't recreate rows deleted since the scan read them
+                    ConditionExpression="attribute_exists(pk)",
+                    ExpressionAttributeValues={":one": {"S": "1"}},
+                )
+            except dynamo.exceptions.ConditionalCheckFailedException:
+                continue
+            updated += 1
+    print(f"✅ has_notes backfilled on {updated} row(s) in {FEEDBACK_TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,8 +28,14 @@ npm install --quiet
 echo "🚀 Deploying to AWS..."
 npx cdk bootstrap
 npx cdk deploy --require-approval never
+cd ..
 
-# --- 6. Fetch CloudFormation Outputs Dynamically ---
+# --- 6. Backfill Data for New Indexes ---
+# Idempotent: only feedback rows predating the notes-index key are updated
+echo "🗂️  Backfilling feedback notes index..."
+python3 backfill_has_notes.py
+
+# --- 7. Fetch CloudFormation Outputs Dynamically ---
 echo ""
 echo "✅ DEPLOYMENT COMPLETE!"
 echo "---------------------------------------------------"
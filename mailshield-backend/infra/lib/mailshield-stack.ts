@@ -36,6 +36,14 @@ export class MailShieldStack extends Stack {
       removalPolicy: RemovalPolicy.DESTROY,
     });
 
+    // Feedback agent reads resolved items only; query them instead of scanning
+    hitlQueueTable.addGlobalSecondaryIndex({
+      indexName: 'status-index',
+      partitionKey: { name: 'status', type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.INCLUDE,
+      nonKeyAttributes: ['notes', 'from_domain', 'verdict', 'log_bucket', 'log_key'],
+    });
+
     const feedbackTable = new dynamodb.Table(this, 'FeedbackTable', {
       tableName: 'sender_feedback_table',
       partitionKey: { name: 'pk', type: dynamodb.AttributeType.STRING },
@@ -44,6 +52,15 @@ export class MailShieldStack extends Stack {
       removalPolicy: RemovalPolicy.DESTROY,
     });
 
+    // Sparse: has_notes is only written on feedback that carries notes
+    // (older rows get it from backfill_has_notes.py, run by cloudshell_deploy.sh)
+    feedbackTable.addGlobalSecondaryIndex({
+      indexName: 'notes-index',
+      partitionKey: { name: 'has_notes', type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.INCLUDE,
+      nonKeyAttributes: ['notes', 'from_domain', 'verdict', 'log_bucket', 'log_key'],
+    });
+
     const domainCacheTable = new dynamodb.Table(this, 'DomainCacheTable', {
       tableName: 'sc_domain_cache',
       partitionKey: { name: 'domain', type: dynamodb.AttributeType.STRING },
@@ -155,7 +172,7 @@ export class MailShieldStack extends Stack {
     feedbackTable.grantReadData(feedbackAgentFn);
     decisionsBucket.grantRead(feedbackAgentFn);
     feedbackAgentFn.addToRolePolicy(new iam.PolicyStatement({
-      actions: ['bedrock:InvokeModel'],
+      actions: ['bedrock:InvokeModel', 'bedrock:InvokeModelWithResponseStream'],
       resources: ['*'],
     }));
 
@@ -186,12 +203,6 @@ export class MailShieldStack extends Stack {
     decisionsBucket.grantReadWrite(controllerFn);
     hitlQueueTable.grantReadWriteData(controllerFn);
     feedbackTable.grantReadData(controllerFn);
-    
-    controllerFn.addToRolePolicy(new iam.PolicyStatement({
-      actions: ['cloudwatch:PutMetricData'],
-      resources: ['*'],
-      conditions: { StringEquals: { 'cloudwatch:namespace': 'SCIntel' } },
-    }));
 
     controllerFn.addPermission('AllowSESInvocation', {
       principal: new iam.ServicePrincipal('ses.amazonaws.com'),
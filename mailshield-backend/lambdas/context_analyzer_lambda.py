@@ -1,41 +1,271 @@
 import json, logging, re
+from dataclasses import dataclass
 from http import HTTPStatus
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # --- PATTERNS ---
-SUSPICIOUS_TERMS = [
+# Compiled once at import so warm invocations skip the re module's cache lookups.
+# Terms are lowercase and matched against lowercased text, so no IGNORECASE.
+def _compile(patterns: Iterable[str]) -> tuple:
+    return tuple(re.compile(p) for p in patterns)
+
+
+SUSPICIOUS_TERMS = _compile([
     r"\bconfirm\b", r"\bverify\b", r"\bupdate\b", r"\bcredential(s)?\b", r"\bpassword\b",
     r"\bbank( account)?\b", r"\bsecure\b", r"\bportal\b",
     r"\bclick\b.*\blink\b", r"\bfollow\b.*\blink\b", r"\buse\b.*\blink\b",
     r"\blink below\b", r"\blink provided\b", r"\bvia the link\b"
-]
-URGENCY_TERMS = [
+])
+URGENCY_TERMS = _compile([
     r"\burgent\b", r"\baction required\b", r"\bimmediately\b", r"\basap\b",
     r"\bavoid delay(s)?\b", r"\bfinal notice\b", r"\bmust\b", r"\brequired\b",
     r"\bprevent\b.*\b(interruption|suspension|lockout)\b",
     r"\bimmediate processing\b", r"\bdelay(ed)? payment(s)?\b"
-]
-MANIPULATIVE_TONE_TERMS = [
+])
+MANIPULATIVE_TONE_TERMS = _compile([
     r"\bto avoid\b.*\b(delay|suspension|termination)\b",
     r"\bfailure to\b.*\bwill result\b",
     r"\bfailure to\b.*\b(delay|issue|penalt(y|ies)|suspension|lockout|cancel)\b",
     r"\bwithout\b.*\b(confirmation|response|action)\b.*\b(delay|hold|impact)\b"
-]
-CREDENTIAL_INTENT_TERMS = [
+])
+CREDENTIAL_INTENT_TERMS = _compile([
     r"\blogin\b", r"\bsign in\b", r"\bverify (?:your )?account\b",
     r"\benter (?:your )?(?:details|credentials|password)\b",
     r"\bconfirm (?:bank|account|details)\b", r"\breactivate\b"
-]
-FINANCIAL_TERMS = [r"\bpayment\b", r"\binvoice\b", r"\brefund\b", r"\btransfer\b", r"\bbilling\b"]
-SUPPORT_TERMS = [r"\bsupport\b", r"\bhelp\b", r"\bassist\b", r"\bissue\b", r"\bticket\b"]
-SCHEDULING_TERMS = [r"\bmeeting\b", r"\bappointment\b", r"\bcalendar\b", r"\breschedule\b"]
-ATTACHMENT_TERMS = [
+])
+FINANCIAL_TERMS = _compile([r"\bpayment\b", r"\binvoice\b", r"\brefund\b", r"\btransfer\b", r"\bbilling\b"])
+SUPPORT_TERMS = _compile([r"\bsupport\b", r"\bhelp\b", r"\bassist\b", r"\bissue\b", r"\bticket\b"])
+SCHEDULING_TERMS = _compile([r"\bmeeting\b", r"\bappointment\b", r"\bcalendar\b", r"\breschedule\b"])
+ATTACHMENT_TERMS = _compile([
     r"\bsee attached\b", r"\bopen the attachment\b", r"\battached file\b",
     r"\battachment\b", r"\battached document\b", r"\battached payroll\b"
+])
+
+# Tone cues
+FRIENDLY_TERMS = _compile([r"\bthank(s| you)\b"])
+PROFESSIONAL_TERMS = _compile([r"\bregards\b", r"\bbest\b", r"\bsincerely\b"])
+
+_URL_RE = re.compile(r'https?://[^\s)>\]]+', re.IGNORECASE)
+
+# --- SINGLE-PASS TERM INDEX ---
+# Nearly every term is a plain word phrase, so _scan_all looks up every category in
+# one walk over the text's words instead of running each regex separately. Only
+# the wildcard co-occurrence patterns (".*") still need the regex engine, and
+# those are split at each ".*" and matched segment by segment (_cooccurs).
+_WORD_RE = re.compile(r"\w+")
+_NEXT_WORD_RE = re.compile(r" (\w+)")
+
+
+def _expand(pattern: str, i: int = 0) -> Tuple[List[str], int]:
+    # Expand the literal regex subset used above (\b, groups, "|", optional "?")
+    # into every phrase it can match. Raises ValueError on anything else.
+    done: List[str] = []
+    variants = [""]
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            if pattern[i + 1 : i + 2] != "b":
+                raise ValueError(pattern)
+            i += 2
+        elif c == "(":
+            i += 3 if pattern.startswith("(?:", i) else 1
+            sub, i = _expand(pattern, i)
+            if pattern[i : i + 1] != ")":
+                raise ValueError(pattern)
+            i += 1
+            if pattern[i : i + 1] == "?":
+                sub.append("")
+                i += 1
+            variants = [v + s for v in variants for s in sub]
+        elif c == ")":
+            break
+        elif c == "|":
+            done.extend(variants)
+            variants = [""]
+            i += 1
+        elif c in ".*+?[]{}^$":
+            raise ValueError(pattern)
+        else:
+            variants = [v + c for v in variants]
+            i += 1
+    return done + variants, i
+
+
+def _literal_phrases(pattern: str) -> Optional[List[str]]:
+    try:
+        phrases, end = _expand(pattern)
+    except ValueError:
+        return None
+    return [p.lower() for p in phrases] if end == len(pattern) else None
+
+
+_TERM_CATEGORIES = {
+    "suspicious": SUSPICIOUS_TERMS,
+    "urgency": URGENCY_TERMS,
+    "manipulative_tone": MANIPULATIVE_TONE_TERMS,
+    "credential_intent": CREDENTIAL_INTENT_TERMS,
+    "financial": FINANCIAL_TERMS,
+    "support": SUPPORT_TERMS,
+    "scheduling": SCHEDULING_TERMS,
+    "attachment": ATTACHMENT_TERMS,
+    "friendly": FRIENDLY_TERMS,
+    "professional": PROFESSIONAL_TERMS,
+}
+
+
+def _segments(pattern: re.Pattern) -> Tuple[re.Pattern, ...]:
+    # "\bA\b.*\bB\b" -> (\bA\b, \bB\b) when every piece is a plain phrase;
+    # anything else stays a single regex.
+    parts = pattern.pattern.split(".*")
+    if len(parts) > 1 and all(_literal_phrases(part) for part in parts):
+        return tuple(re.compile(part) for part in parts)
+    return (pattern,)
+
+
+def _cooccurs(segments: Tuple[re.Pattern, ...], text: str, pos: int) -> bool:
+    # Same result as re.search("seg1.*seg2...", text, pos), in linear time. "."
+    # stops at newlines, so every segment must fall on one line, in order. Taking
+    # the earliest match of each segment after the previous one is enough: phrase
+    # segments end in word order, so an earlier match never rules out a later one.
+    # If a line has no full match, resume on the next line.
+    first, rest = segments[0], segments[1:]
+    while True:
+        m = first.search(text, pos)
+        if not m:
+            return False
+        line_end = text.find("\n", m.end())
+        if line_end < 0:
+            line_end = len(text)
+        for seg in rest:
+            m = seg.search(text, m.end(), line_end)
+            if not m:
+                break
+        else:
+            return True
+        pos = line_end + 1
+
+
+def _build_term_index():
+    # phrase -> [(category, term index)]; a term counts once however many of its
+    # phrases hit. Terms that are not plain phrases are kept as regex segments,
+    # each with the phrases its leading literal can take: the term can only match
+    # when one of them is in the text, so it is skipped otherwise.
+    phrase_terms: Dict[str, List[Tuple[str, int]]] = {}
+    residual: List[Tuple[str, int, Tuple[re.Pattern, ...], Optional[frozenset]]] = []
+    for cat, terms in _TERM_CATEGORIES.items():
+        for idx, pat in enumerate(terms):
+            phrases = _literal_phrases(pat.pattern)
+            if phrases is None:
+                anchors = _literal_phrases(pat.pattern.split(".*", 1)[0])
+                residual.append(
+                    (cat, idx, _segments(pat), frozenset(anchors) if anchors else None)
+                )
+                continue
+            for phrase in phrases:
+                phrase_terms.setdefault(phrase, []).append((cat, idx))
+    return phrase_terms, residual
+
+
+_PHRASE_TERMS, _RESIDUAL_PATTERNS = _build_term_index()
+_PHRASES = frozenset(_PHRASE_TERMS)
+# Multi-word phrases the scan must assemble: terms plus residual anchors
+_MULTI_WORD = [p for p in _PHRASES if " " in p] + [
+    a for *_, anchors in _RESIDUAL_PATTERNS for a in (anchors or ()) if " " in a
 ]
+_PHRASE_HEADS = frozenset(p.split(" ", 1)[0] for p in _MULTI_WORD)
+_MAX_PHRASE_WORDS = max(p.count(" ") + 1 for p in _MULTI_WORD)
+_HEAD_RE = re.compile(r"\b(?:" + "|".join(sorted(_PHRASE_HEADS)) + r")\b")
+
+
+def _text_phrases(lowered: str, body_at: int) -> Tuple[Set[str], Set[str]]:
+    # Every word, plus every multi-word run (single-space separated) that starts
+    # with the first word of a known phrase. Returns (whole text, body only),
+    # where the body is lowered[body_at:].
+    body = set(_WORD_RE.findall(lowered, body_at))
+    found = body | set(_WORD_RE.findall(lowered, 0, body_at))
+    if found & _PHRASE_HEADS:
+        for m in _HEAD_RE.finditer(lowered):
+            phrase, pos = m.group(0), m.end()
+            in_body = m.start() >= body_at
+            for _ in range(_MAX_PHRASE_WORDS - 1):
+                nxt = _NEXT_WORD_RE.match(lowered, pos)
+                if not nxt:
+                    break
+                phrase = f"{phrase} {nxt.group(1)}"
+                found.add(phrase)
+                if in_body:
+                    body.add(phrase)
+                pos = nxt.end()
+    return found, body
+
+
+def _scan_all(subject: str, body_lower: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Count distinct matched terms per category in one pass over "subject body".
+    body_lower is body.lower(), shared with the caller. ASCII text only; the
+    rest goes through _scan_all_folded.
+    Returns (counts for subject + body, counts for the body alone).
+    """
+    lowered = f"{subject.lower()} {body_lower}"
+    body_at = len(lowered) - len(body_lower)
+    # (category, term index) pairs, so each term counts once
+    text_hits: Set[Tuple[str, int]] = set()
+    body_hits: Set[Tuple[str, int]] = set()
+
+    text_phrases, body_phrases = _text_phrases(lowered, body_at)
+    for phrase in text_phrases & _PHRASES:
+        text_hits.update(_PHRASE_TERMS[phrase])
+    for phrase in body_phrases & _PHRASES:
+        body_hits.update(_PHRASE_TERMS[phrase])
+
+    for cat, idx, segments, anchors in _RESIDUAL_PATTERNS:
+        if anchors is not None and text_phrases.isdisjoint(anchors):
+            continue
+        if not _cooccurs(segments, lowered, 0):
+            continue
+        text_hits.add((cat, idx))
+        if (anchors is None or not body_phrases.isdisjoint(anchors)) and _cooccurs(
+            segments, lowered, body_at
+        ):
+            body_hits.add((cat, idx))
+
+    return _count_by_category(text_hits), _count_by_category(body_hits)
+
+
+def _count_by_category(hits: Set[Tuple[str, int]]) -> Dict[str, int]:
+    counts = dict.fromkeys(_TERM_CATEGORIES, 0)
+    for cat, _ in hits:
+        counts[cat] += 1
+    return counts
+
+
+# The phrase index matches lowercased text, which only agrees with IGNORECASE on
+# ASCII: "ſ" matches "s" under IGNORECASE but .lower() keeps it, and "İ" lowers
+# to "i" + a combining dot, which adds a word boundary. Other text is matched,
+# as given, term by term with the IGNORECASE patterns (as segments, see _cooccurs).
+_FOLDED_TERMS = [
+    (cat, idx, tuple(re.compile(seg.pattern, re.IGNORECASE) for seg in _segments(pat)))
+    for cat, terms in _TERM_CATEGORIES.items()
+    for idx, pat in enumerate(terms)
+]
+
+
+def _scan_all_folded(subject: str, body: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """_scan_all for text that isn't ASCII."""
+    text = f"{subject} {body}"
+    body_at = len(text) - len(body)
+    text_hits: Set[Tuple[str, int]] = set()
+    body_hits: Set[Tuple[str, int]] = set()
+    for cat, idx, segments in _FOLDED_TERMS:
+        if _cooccurs(segments, text, 0):
+            text_hits.add((cat, idx))
+            if _cooccurs(segments, text, body_at):
+                body_hits.add((cat, idx))
+    return _count_by_category(text_hits), _count_by_category(body_hits)
+
 
 # Weights determine the maximum risk contribution of a category
 WEIGHTS = {
@@ -47,135 +277,224 @@ WEIGHTS = {
 }
 THRESHOLDS = {"phishing": 0.5}
 
-
-def find_matches(patterns: List[str], text: str) -> List[str]:
-    # Return all unique matches to allow intensity scoring
-    matches = []
-    for p in patterns:
-        m = re.search(p, text, flags=re.IGNORECASE)
-        if m:
-            matches.append(m.group(0))
-    return list(set(matches))
+# json.dumps builds a fresh JSONEncoder whenever it is given options; reuse one
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
 
 
-def extract_urls(text: str) -> List[str]:
-    return re.findall(r'https?://[^\s)>\]]+', text, flags=re.IGNORECASE)
+def _count_urls(text: str) -> int:
+    # Scoring only needs the count; skip building the list of URL strings
+    return sum(1 for _ in _URL_RE.finditer(text))
 
 
 def clamp01(x: float) -> float:
     return max(0.0, min(1.0, round(x, 3)))
 
 
-def classify_tone(body: str) -> str:
-    if find_matches(MANIPULATIVE_TONE_TERMS, body):
+def classify_tone(body_lower: str, counts: Dict[str, int]) -> str:
+    if counts["manipulative_tone"]:
         return "manipulative"
-    if re.search(r"\bthank(s| you)\b", body, re.I) or "appreciate" in body.lower():
+    if counts["friendly"] or "appreciate" in body_lower:
         return "friendly"
-    if re.search(r"\bregards\b|\bbest\b|\bsincerely\b", body, re.I):
+    if counts["professional"]:
         return "professional"
     return "neutral"
 
 
-def classify_urgency(body: str) -> str:
-    return "urgent" if find_matches(URGENCY_TERMS, body) else "routine"
+def classify_urgency(counts: Dict[str, int]) -> str:
+    return "urgent" if counts["urgency"] else "routine"
 
 
-def infer_intent(body: str) -> str:
-    if find_matches(CREDENTIAL_INTENT_TERMS, body):
+def infer_intent(counts: Dict[str, int]) -> str:
+    if counts["credential_intent"]:
         return "credential_request"
-    if find_matches(FINANCIAL_TERMS, body):
+    if counts["financial"]:
         return "financial_action"
-    if find_matches(SUPPORT_TERMS, body):
+    if counts["support"]:
         return "support_request"
-    if find_matches(SCHEDULING_TERMS, body):
+    if counts["scheduling"]:
         return "scheduling"
     return "informational"
 
 
-def score_features(subject: str, body: str) -> Dict[str, Any]:
-    text = f"{subject} {body}"
-    urls = extract_urls(text)
+@dataclass(slots=True)
+class Signals:
+    # Field order is the order signals/scores are rendered in the response
+    credential_language: int
+    urgency_language: int
+    manipulative_tone: int
+    suspicious_link: int
+    attachment_reference: int
+
+    def as_bool_dict(self) -> Dict[str, bool]:
+        return {
+            "credential_language": self.credential_language > 0,
+            "urgency_language": self.urgency_language > 0,
+            "manipulative_tone": self.manipulative_tone > 0,
+            "suspicious_link": self.suspicious_link > 0,
+            "attachment_reference": self.attachment_reference > 0,
+        }
+
+
+def score_features(subject: str, body: str, counts: Dict[str, int]) -> Signals:
+    # counts: the subject + body half of _scan_all
+    # URLs never span whitespace, so subject and body can be counted separately
+    url_count = _count_urls(subject) + _count_urls(body)
     
     # Return counts (intensity) AND booleans for simple checks
-    return {
-        "credential_language": len(find_matches(CREDENTIAL_INTENT_TERMS + SUSPICIOUS_TERMS, text)),
-        "urgency_language": len(find_matches(URGENCY_TERMS, text)),
-        "manipulative_tone": len(find_matches(MANIPULATIVE_TONE_TERMS, text)),
-        "suspicious_link": len(urls),
-        "attachment_reference": len(find_matches(ATTACHMENT_TERMS, text)),
-    }
+    return Signals(
+        credential_language=counts["credential_intent"] + counts["suspicious"],
+        urgency_language=counts["urgency"],
+        manipulative_tone=counts["manipulative_tone"],
+        suspicious_link=url_count,
+        attachment_reference=counts["attachment"],
+    )
 
 
-def compute_scores(signals: Dict[str, Any]) -> Dict[str, float]:
-    # Score based on intensity logic
-    # 1 match = 60% of weight, 2 matches = 90%, 3+ = 100%
-    final_scores = {}
-    
-    for k, count in signals.items():
-        if count == 0:
-            final_scores[k] = 0.0
-        else:
-            max_weight = WEIGHTS.get(k, 0.0)
-            impact_factor = min(1.0, 0.6 + (0.3 * (count - 1)))
-            final_scores[k] = round(max_weight * impact_factor, 3)
-            
-    return final_scores
+# Score based on intensity logic
+# 1 match = 60% of weight, 2 matches = 90%, 3+ = 100%
+# Precomputed per category and indexed by min(count, _MAX_INTENSITY).
+_MAX_INTENSITY = 3
+
+
+def _score_row(max_weight: float) -> Tuple[float, ...]:
+    return (0.0,) + tuple(
+        round(max_weight * min(1.0, 0.6 + (0.3 * (count - 1))), 3)
+        for count in range(1, _MAX_INTENSITY + 1)
+    )
+
+
+_SCORE_TABLE = {k: _score_row(w) for k, w in WEIGHTS.items()}
+_CRED_ROW = _SCORE_TABLE["credential_language"]
+_URGENCY_ROW = _SCORE_TABLE["urgency_language"]
+_TONE_ROW = _SCORE_TABLE["manipulative_tone"]
+_LINK_ROW = _SCORE_TABLE["suspicious_link"]
+_ATTACH_ROW = _SCORE_TABLE["attachment_reference"]
+
+
+def compute_scores(signals: Signals) -> Dict[str, float]:
+    return {
+        "credential_language": _CRED_ROW[min(signals.credential_language, _MAX_INTENSITY)],
+        "urgency_language": _URGENCY_ROW[min(signals.urgency_language, _MAX_INTENSITY)],
+        "manipulative_tone": _TONE_ROW[min(signals.manipulative_tone, _MAX_INTENSITY)],
+        "suspicious_link": _LINK_ROW[min(signals.suspicious_link, _MAX_INTENSITY)],
+        "attachment_reference": _ATTACH_ROW[min(signals.attachment_reference, _MAX_INTENSITY)],
+    }
 
 
 def classify(total: float) -> str:
     return "phishing" if total >= THRESHOLDS["phishing"] else "safe"
 
 
-def compute_confidence(total: float, classification: str) -> float:
+# Confidence curve constants, hoisted out of the per-call path
+_PHISH_THR = THRESHOLDS["phishing"]
+_INV_ONE_MINUS = 1.0 / (1.0 - _PHISH_THR)
+_INV_THR = 1.0 / _PHISH_THR
+
+
+def _compute_confidence(total: float, is_phishing: bool) -> float:
     # Non-linear confidence mapping to avoid "stuck" scores
     # We use 'total' (the risk score) to determine how confident we are
     
-    if classification == "phishing":
+    if is_phishing:
         # Risk 0.50 -> Conf 0.60
         # Risk 1.00 -> Conf 0.99
         # Curve: slightly exponential to favor high confidence on high risk
-        dist = (total - THRESHOLDS["phishing"]) / (1.0 - THRESHOLDS["phishing"])
+        dist = (total - _PHISH_THR) * _INV_ONE_MINUS
         conf = 0.60 + (0.39 * (dist ** 0.8)) # power of 0.8 pushes curve up slightly
-        return clamp01(conf)
     else:
         # Risk 0.00 -> Conf 0.99 (Safe)
         # Risk 0.49 -> Conf 0.55 (Unsure)
-        dist = (THRESHOLDS["phishing"] - total) / THRESHOLDS["phishing"]
+        dist = (_PHISH_THR - total) * _INV_THR
         conf = 0.55 + (0.44 * (dist ** 0.8))
-        return clamp01(conf)
+    # clamp01, inlined
+    return max(0.0, min(1.0, round(conf, 3)))
+
+
+def compute_confidence(total: float, classification: str) -> float:
+    return _compute_confidence(total, classification == "phishing")
 
 
-def agentic_reasoning(subject: str, body: str, signals: Dict[str, Any]) -> List[str]:
+# Reasoning trace messages
+_MSG_CRED_WITH_LINK = "CRITICAL: Detected credential request combined with external links - highly indicative of phishing."
+_MSG_CRED_NO_LINK = "Detected credential request language without links (potential reply-chain phishing)."
+_MSG_URGENCY = "Detected urgency terminology (%d instance(s))."
+_MSG_LINK_DENSITY = "High density of links detected (%d), common in mass-scatter phishing."
+_MSG_LINKS = "Contains external links."
+_MSG_NOTHING = "No significant phishing patterns detected."
+
+
+def agentic_reasoning(subject: str, body: str, signals: Signals) -> List[str]:
     trace: List[str] = []
     
-    cred_count = signals.get("credential_language", 0)
-    link_count = signals.get("suspicious_link", 0)
-    urg_count = signals.get("urgency_language", 0)
+    cred_count = signals.credential_language
+    link_count = signals.suspicious_link
+    urg_count = signals.urgency_language
 
     # Critical Combination Check
-    if cred_count > 0 and link_count > 0:
-        trace.append("CRITICAL: Detected credential request combined with external links - highly indicative of phishing.")
-    
-    if cred_count > 0 and link_count == 0:
-        trace.append("Detected credential request language without links (potential reply-chain phishing).")
+    if cred_count > 0:
+        trace.append(_MSG_CRED_WITH_LINK if link_count > 0 else _MSG_CRED_NO_LINK)
 
     if urg_count > 0:
-        trace.append(f"Detected urgency terminology ({urg_count} instance(s)).")
+        trace.append(_MSG_URGENCY % urg_count)
 
     if link_count > 2:
-        trace.append(f"High density of links detected ({link_count}), common in mass-scatter phishing.")
+        trace.append(_MSG_LINK_DENSITY % link_count)
     elif link_count > 0:
-        trace.append("Contains external links.")
-
-    if signals.get("financial_action", 0) > 0: # Note: need to pass this through if we want to trace it
-        trace.append("Financial terminology detected.")
+        trace.append(_MSG_LINKS)
 
     if not trace:
-        trace.append("No significant phishing patterns detected.")
+        trace.append(_MSG_NOTHING)
 
     return trace
 
 
+def analyze_compact(compact: Dict[str, Any]) -> Dict[str, Any]:
+    subject = compact.get("subject", "") or ""
+    body = compact.get("body", "") or ""
+
+    # One scan feeds intent/tone/urgency (body only) and the risk signals
+    body_lower = body.lower()
+    if subject.isascii() and body.isascii():
+        text_counts, body_counts = _scan_all(subject, body_lower)
+    else:
+        text_counts, body_counts = _scan_all_folded(subject, body)
+    intent = infer_intent(body_counts)
+    tone = classify_tone(body_lower, body_counts)
+    urgency = classify_urgency(body_counts)
+
+    signals = score_features(subject, body, text_counts)
+    
+    # Critical Combination Boost
+    # If Credential Language + Link, boost the virtual score
+    # This prevents "Credential Harvesting" from ever slipping by as "Safe"
+    if signals.credential_language > 0 and signals.suspicious_link > 0:
+        # Artificial boost to ensure it crosses threshold
+        signals.credential_language = max(signals.credential_language, 2) 
+    
+    scores = compute_scores(signals)
+    total_risk = clamp01(sum(scores.values()))
+    
+    classification = classify(total_risk)
+    confidence = compute_confidence(total_risk, classification)
+    reasoning = agentic_reasoning(subject, body, signals)
+
+    # Convert signals to boolean for simpler UI display if needed
+    signals_bool = signals.as_bool_dict()
+
+    return {
+        "confidence_final": confidence,
+        "notes": [{
+            "intent": intent,
+            "tone": tone,
+            "urgency": urgency,
+            "classification": classification,
+            "reasoning": reasoning,
+            "signals": signals_bool,
+            "scores": scores,
+        }],
+    }
+
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     try:
         params = event.get("parameters") or []
@@ -191,44 +510,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             compact = json.loads(compact_raw)
 
-        subject = compact.get("subject", "") or ""
-        body = compact.get("body", "") or ""
-
-        intent = infer_intent(body)
-        tone = classify_tone(body)
-        urgency = classify_urgency(body)
-
-        signals = score_features(subject, body)
-        
-        # Critical Combination Boost
-        # If Credential Language + Link, boost the virtual score
-        # This prevents "Credential Harvesting" from ever slipping by as "Safe"
-        if signals["credential_language"] > 0 and signals["suspicious_link"] > 0:
-            # Artificial boost to ensure it crosses threshold
-            signals["credential_language"] = max(signals["credential_language"], 2) 
-        
-        scores = compute_scores(signals)
-        total_risk = clamp01(sum(scores.values()))
-        
-        classification = classify(total_risk)
-        confidence = compute_confidence(total_risk, classification)
-        reasoning = agentic_reasoning(subject, body, signals)
-
-        # Convert signals to boolean for simpler UI display if needed
-        signals_bool = {k: v > 0 for k, v in signals.items()}
-
-        result = {
-            "confidence_final": confidence,
-            "notes": [{
-                "intent": intent,
-                "tone": tone,
-                "urgency": urgency,
-                "classification": classification,
-                "reasoning": reasoning,
-                "signals": signals_bool,
-                "scores": scores,
-            }],
-        }
+        result = analyze_compact(compact)
 
         return {
             "response": {
@@ -236,7 +518,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 "function": event.get("function", "analyze_context"),
                 "functionResponse": {
                     "responseBody": {
-                        "TEXT": {"body": json.dumps(result, ensure_ascii=False)}
+                        "TEXT": {"body": _JSON_ENCODER.encode(result)}
                     }
                 },
             },
@@ -248,4 +530,18 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return {
             "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
             "body": f"Error: {str(e)}",
-        }
\ No newline at end of file
+        }
+
+
+def lambda_handler_batch(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    # Bulk entry point (SQS batch / Step Functions Map): event["messages"] is a
+    # list of compact dicts (or their JSON strings); one result per message.
+    results: List[Dict[str, Any]] = []
+    for i, msg in enumerate(event.get("messages") or []):
+        try:
+            compact = json.loads(msg) if isinstance(msg, str) else (msg or {})
+            results.append(analyze_compact(compact))
+        except Exception as e:
+            logger.exception("context_analyzer batch: message %d failed", i)
+            results.append({"error": str(e)})
+    return {"results": results}
@@ -1,11 +1,20 @@
 import json
 import logging
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
 
+def _coalesce(*values: Any, default: Any = "") -> Any:
+    # First truthy value, else default
+    for v in values:
+        if v:
+            return v
+    return default
+
+
 def _extract_signals(run: Dict[str, Any]) -> Dict[str, Any]:
     """
     Pull out the key signals the decision agent should look at.
@@ -25,8 +34,15 @@ def _extract_signals(run: Dict[str, Any]) -> Dict[str, Any]:
     except Exception:
         sender_risk = 0.0
 
+    # Summary fields fall back to the first content-analyzer note
+    notes = content.get("notes")
+    if isinstance(notes, list) and notes and isinstance(notes[0], dict):
+        note0 = notes[0]
+    else:
+        note0 = {}
+
     # Classification + confidence
-    classification = (summary.get("classification") or "").lower()
+    classification = _coalesce(summary.get("classification"), note0.get("classification")).lower()
     conf = summary.get("confidence")
     if conf is None:
         conf = content.get("confidence_final")
@@ -36,18 +52,9 @@ def _extract_signals(run: Dict[str, Any]) -> Dict[str, Any]:
         confidence = 0.0
 
     # Intent / tone / urgency
-    intent = summary.get("intent") or ""
-    tone = summary.get("tone") or ""
-    urgency = summary.get("urgency") or ""
-
-    notes = content.get("notes") or []
-    if notes and isinstance(notes, list) and isinstance(notes[0], dict):
-        note0 = notes[0]
-        if not classification:
-            classification = (note0.get("classification") or "").lower()
-        intent = intent or note0.get("intent") or ""
-        tone = tone or note0.get("tone") or ""
-        urgency = urgency or note0.get("urgency") or ""
+    intent = _coalesce(summary.get("intent"), note0.get("intent"))
+    tone = _coalesce(summary.get("tone"), note0.get("tone"))
+    urgency = _coalesce(summary.get("urgency"), note0.get("urgency"))
 
     # PHI intensity
     try:
@@ -57,11 +64,9 @@ def _extract_signals(run: Dict[str, Any]) -> Dict[str, Any]:
 
     # Basic identity
     from_obj = compact.get("from") or {}
-    from_addr = (from_obj.get("addr") or from_obj.get("email") or "")
-    if "@" in from_addr:
-        from_domain = from_addr.split("@", 1)[1]
-    else:
-        from_domain = ""
+    from_addr = _coalesce(from_obj.get("addr"), from_obj.get("email"))
+    # Empty separator (and so empty domain) when there is no "@"
+    _, _, from_domain = from_addr.partition("@")
 
     subject = compact.get("subject") or ""
     prior_decision = (run.get("decision") or "").upper() or "ALLOW"
@@ -93,6 +98,47 @@ def _extract_signals(run: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+# Rules 1-5 + default, evaluated in order; first match wins.
+# (predicate, decision, hitl_status, reason template)
+# Predicates take (is_phish, is_safe, has_phi, confidence, sender_risk, prior_decision).
+# A decision of None keeps the prior (baseline) decision.
+_DISPATCH = (
+    # === RULE 1: HIGH CONFIDENCE PHISHING (AUTO-QUARANTINE) ===
+    (lambda phish, safe, phi, conf, risk, prior: phish and conf >= 0.85,
+     "QUARANTINE", "skipped",  # Auto-block
+     "High-confidence phishing detection ({confidence:.2f}). Auto-quarantined to reduce alert fatigue."),
+    # === RULE 2: EXTREME SENDER RISK (AUTO-QUARANTINE) ===
+    (lambda phish, safe, phi, conf, risk, prior: risk >= 85,
+     "QUARANTINE", "skipped",
+     "Sender risk is critical ({sender_risk:.1f}). Auto-quarantined."),
+    # === RULE 3: THE GRAY ZONE (HITL REQUIRED) ===
+    (lambda phish, safe, phi, conf, risk, prior: phish and 0.50 <= conf < 0.85,
+     "QUARANTINE", "required",
+     "Suspected phishing with moderate confidence ({confidence:.2f}). Requires human verification."),
+    (lambda phish, safe, phi, conf, risk, prior: safe and risk >= 60,
+     "QUARANTINE", "required",
+     "Content appears safe, but sender risk is high ({sender_risk:.1f}). IT review required."),
+    # === RULE 4: PHI COMPLIANCE (NUANCED) ===
+    (lambda phish, safe, phi, conf, risk, prior: phi and safe and conf >= 0.75 and risk < 50,
+     "ALLOW", "skipped",
+     "Contains PHI ({phi_entities} entities), but sender/content confidence is high. Allowed."),
+    (lambda phish, safe, phi, conf, risk, prior: phi,
+     "ALLOW", "required",  # Allow technically, but hold for review
+     "Contains PHI with lower confidence ({confidence:.2f}) or elevated risk. Compliance review required."),
+    # === RULE 5: HIGH CONFIDENCE SAFE (AUTO-ALLOW) ===
+    (lambda phish, safe, phi, conf, risk, prior: safe and conf >= 0.80 and risk < 50,
+     "ALLOW", "skipped",
+     "High-confidence safe email ({confidence:.2f})."),
+    # === DEFAULT ===
+    (lambda phish, safe, phi, conf, risk, prior: prior == "QUARANTINE",
+     "QUARANTINE", "required",
+     "Baseline logic quarantined message; requiring HITL confirmation."),
+    (lambda phish, safe, phi, conf, risk, prior: True,
+     None, "skipped",
+     "Routine email; no high-risk signals detected."),
+)
+
+
 def _decide(signals: Dict[str, Any]) -> Dict[str, Any]:
     """
     Decision Logic to prevent Alert Fatigue:
@@ -108,88 +154,52 @@ def _decide(signals: Dict[str, Any]) -> Dict[str, Any]:
     prior_decision = (signals.get("prior_decision") or "ALLOW").upper()
     
     trust_tier = signals.get("feedback_trust_tier")
-
-    reasons = []
-    decision = prior_decision
-    risk = sender_risk 
-
-    is_phish = classification == "phishing"
-    is_safe = classification == "safe"
+    # Only these two tiers change the outcome; anything else keys the cache as None
+    if trust_tier not in ("blocked", "trusted"):
+        trust_tier = None
+
+    decision, reasons, hitl_status = _decide_cached(
+        classification == "phishing", classification == "safe",
+        confidence, sender_risk, phi_entities, prior_decision, trust_tier,
+    )
+    return _pkg(decision, sender_risk, list(reasons), hitl_status, signals)
+
+
+@lru_cache(maxsize=1024)
+def _decide_cached(
+    is_phish: bool,
+    is_safe: bool,
+    confidence: float,
+    sender_risk: float,
+    phi_entities: int,
+    prior_decision: str,
+    trust_tier: Optional[str],
+) -> Tuple[str, Tuple[str, ...], str]:
+    # Keyed on the exact inputs the rules read, so a hit is always the same
+    # verdict; _pkg still builds a fresh response around it per call.
     has_phi = phi_entities > 0
-    
-    hitl_status = ""
 
     # === RULE 0: HUMAN FEEDBACK CACHE (FAST TRACK) ===
     if trust_tier == "blocked":
-        decision = "QUARANTINE"
-        hitl_status = "skipped"
-        reasons.append("Sender is explicitly blocked by previous IT verdict. Auto-quarantined.")
         # We return early because human block overrides almost everything
-        return _pkg(decision, risk, reasons, hitl_status, signals)
+        return "QUARANTINE", ("Sender is explicitly blocked by previous IT verdict. Auto-quarantined.",), "skipped"
 
+    reasons: Tuple[str, ...] = ()
     if trust_tier == "trusted":
         # If trusted, we skip HITL unless it's blatantly malicious content
         if is_phish and confidence > 0.90:
             # Trusted sender but hacked account sending blatant phishing?
-            decision = "QUARANTINE"
-            hitl_status = "required"
-            reasons.append("Sender is normally trusted, but content is high-confidence phishing. Account compromise suspected.")
+            # Falls through: Rule 1 below then decides the outcome.
+            reasons = ("Sender is normally trusted, but content is high-confidence phishing. Account compromise suspected.",)
         elif is_safe:
-            decision = "ALLOW"
-            hitl_status = "skipped"
-            reasons.append(f"Sender is trusted by IT history. Auto-allowed despite risk score {sender_risk:.1f}.")
-            return _pkg(decision, risk, reasons, hitl_status, signals)
-
-    # === RULE 1: HIGH CONFIDENCE PHISHING (AUTO-QUARANTINE) ===
-    if is_phish and confidence >= 0.85:
-        decision = "QUARANTINE"
-        hitl_status = "skipped" # Auto-block
-        reasons.append(f"High-confidence phishing detection ({confidence:.2f}). Auto-quarantined to reduce alert fatigue.")
-
-    # === RULE 2: EXTREME SENDER RISK (AUTO-QUARANTINE) ===
-    elif sender_risk >= 85:
-        decision = "QUARANTINE"
-        hitl_status = "skipped"
-        reasons.append(f"Sender risk is critical ({sender_risk:.1f}). Auto-quarantined.")
-
-    # === RULE 3: THE GRAY ZONE (HITL REQUIRED) ===
-    elif is_phish and 0.50 <= confidence < 0.85:
-        decision = "QUARANTINE"
-        hitl_status = "required"
-        reasons.append(f"Suspected phishing with moderate confidence ({confidence:.2f}). Requires human verification.")
-
-    elif is_safe and sender_risk >= 60:
-        decision = "QUARANTINE"
-        hitl_status = "required"
-        reasons.append(f"Content appears safe, but sender risk is high ({sender_risk:.1f}). IT review required.")
-
-    # === RULE 4: PHI COMPLIANCE (NUANCED) ===
-    elif has_phi:
-        if is_safe and confidence >= 0.75 and sender_risk < 50:
-            decision = "ALLOW"
-            hitl_status = "skipped"
-            reasons.append(f"Contains PHI ({phi_entities} entities), but sender/content confidence is high. Allowed.")
-        else:
-            decision = "ALLOW" # Allow technically, but hold for review
-            hitl_status = "required"
-            reasons.append(f"Contains PHI with lower confidence ({confidence:.2f}) or elevated risk. Compliance review required.")
-
-    # === RULE 5: HIGH CONFIDENCE SAFE (AUTO-ALLOW) ===
-    elif is_safe and confidence >= 0.80 and sender_risk < 50:
-        decision = "ALLOW"
-        hitl_status = "skipped"
-        reasons.append(f"High-confidence safe email ({confidence:.2f}).")
-
-    # === DEFAULT ===
-    else:
-        if decision == "QUARANTINE":
-            hitl_status = "required"
-            reasons.append("Baseline logic quarantined message; requiring HITL confirmation.")
-        else:
-            hitl_status = "skipped"
-            reasons.append("Routine email; no high-risk signals detected.")
-
-    return _pkg(decision, risk, reasons, hitl_status, signals)
+            return "ALLOW", (f"Sender is trusted by IT history. Auto-allowed despite risk score {sender_risk:.1f}.",), "skipped"
+
+    for pred, decision, hitl_status, template in _DISPATCH:
+        if pred(is_phish, is_safe, has_phi, confidence, sender_risk, prior_decision):
+            reason = template.format(
+                confidence=confidence, sender_risk=sender_risk, phi_entities=phi_entities,
+            )
+            return decision or prior_decision, reasons + (reason,), hitl_status
 
 def _pkg(decision, risk, reasons, hitl_status, signals):
     hitl = {
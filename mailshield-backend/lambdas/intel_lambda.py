@@ -1,21 +1,54 @@
 # intel_lambda.py
-import json, os, time, logging, re
+import json, os, time, logging, re, types
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from functools import lru_cache
 from typing import Any, Dict, Optional, Tuple, List
-import boto3, botocore, requests
+import boto3, botocore, urllib3
+from botocore.config import Config
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
-DDB = boto3.client("dynamodb")
-S3  = boto3.client("s3")
+# Tight timeouts/retries to match the OSINT budget, and a pool big enough for
+# the probe threads that share these clients.
+_BOTO_CFG = Config(
+    connect_timeout=1.0,
+    read_timeout=1.5,
+    retries={"max_attempts": 2, "mode": "standard"},
+    tcp_keepalive=True,
+    max_pool_connections=20,
+)
+DDB = boto3.client("dynamodb", config=_BOTO_CFG)
+S3  = boto3.client("s3", config=_BOTO_CFG)
 
-HTTP_TIMEOUT: Tuple[float, float] = (1.2, 1.5)
+HTTP_TIMEOUT = urllib3.Timeout(connect=1.2, read=1.5)
 BUDGET_S = float(os.getenv("OSINT_BUDGET_S", "2.2"))
 
 DDB_DOM   = os.getenv("DDB_DOM") or ""
 DDB_IP    = os.getenv("DDB_IP") or ""
 DDB_GRAPH = os.getenv("DDB_GRAPH") or ""
 
+# Optional DAX cluster in front of the domain/IP cache tables (write-through,
+# so reads and writes both go via CACHE_DDB). Needs the function in the
+# cluster's VPC and amazondax bundled; if the client can't be built the
+# caches use DDB directly.
+DAX_ENDPOINT = os.getenv("DAX_ENDPOINT") or ""
+
+
+def _cache_client():
+    if not DAX_ENDPOINT:
+        return DDB
+    try:
+        from amazondax import AmazonDaxClient
+
+        return AmazonDaxClient(endpoint_url=DAX_ENDPOINT)
+    except Exception as e:
+        log.warning("DAX unavailable (%s); caches use DynamoDB directly", e)
+        return DDB
+
+
+CACHE_DDB = _cache_client()
+
 DDB_TTL_DOM = int(os.getenv("DDB_TTL_DOM", str(7 * 24 * 3600)))
 DDB_TTL_IP  = int(os.getenv("DDB_TTL_IP",  str(24 * 3600)))
 
@@ -29,11 +62,31 @@ BRAND_BASES_KEY  = os.getenv("BRAND_BASES_KEY") or ""
 ORG_ENTITIES_KEY = os.getenv("ORG_ENTITIES_KEY") or ""
 _ORG_CACHE = None
 
+# Parsed static config is mirrored to /tmp so a fresh process in a reused
+# sandbox can skip the S3 round trip.
+CFG_TMP_DIR   = os.getenv("CFG_TMP_DIR", "/tmp")
+CFG_TMP_TTL_S = int(os.getenv("CFG_TMP_TTL_S", "300"))
+
 URLSCAN_KEY   = os.getenv("URLSCAN_KEY") or ""
 ABUSEIPDB_KEY = os.getenv("ABUSEIPDB_KEY") or ""
 
-SESSION = requests.Session()
-SESSION.headers.update({"User-Agent": "sc-intel/1.0"})
+# Plain urllib3 for the OSINT GETs: no retries, redirects followed, and
+# connections kept per host across warm invocations.
+HTTP = urllib3.PoolManager(
+    num_pools=16,
+    maxsize=8,
+    timeout=HTTP_TIMEOUT,
+    retries=urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=10),
+)
+HTTP_HEADERS = {"User-Agent": "sc-intel/1.0", **urllib3.make_headers(accept_encoding=True)}
+_CHARSET_RX = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+
+# OSINT probes are pure network waits; run them side by side instead of
+# back to back. The pool (like HTTP) is reused across warm invocations.
+OSINT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="osint")
+# Page fetches fanned out from inside a probe get their own pool, so a probe
+# waiting on them never holds the workers they need.
+FETCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="osint-fetch")
 NOW = lambda: int(time.time())
 
 AG_NAME = "intel"
@@ -54,8 +107,7 @@ def _load_org_entities() -> dict:
         return _ORG_CACHE
 
     try:
-        obj = S3.get_object(Bucket=CFG_BUCKET, Key=ORG_ENTITIES_KEY)
-        _ORG_CACHE = json.loads(obj["Body"].read().decode("utf-8"))
+        _ORG_CACHE = _cfg_json(ORG_ENTITIES_KEY) or {}
         log.info("Loaded org entities config with %d entries", len(_ORG_CACHE))
     except Exception:
         log.exception("failed to load org entities config")
@@ -112,6 +164,11 @@ def _wrap_openapi_json(
     }
 
 
+# The response body is a freshly built tree of plain dicts/lists, so the
+# encoder's per-container circular-reference bookkeeping is pure overhead.
+_body_json = json.JSONEncoder(check_circular=False).encode
+
+
 def _wrap_function_response(event: Dict[str, Any], body_obj: Dict[str, Any]) -> Dict[str, Any]:
     action_group = event.get("actionGroup") or AG_NAME
     function = event.get("function") or FN_NAME
@@ -121,7 +178,7 @@ def _wrap_function_response(event: Dict[str, Any], body_obj: Dict[str, Any]) ->
             "actionGroup": action_group,
             "function": function,
             "functionResponse": {
-                "responseBody": {"TEXT": {"body": json.dumps(body_obj)}}
+                "responseBody": {"TEXT": {"body": _body_json(body_obj)}}
             },
         },
         "sessionAttributes": event.get("sessionAttributes", {}),
@@ -149,34 +206,59 @@ def _maybe_parse_json_string(s: Any) -> Optional[Dict[str, Any]]:
     return s if isinstance(s, dict) else None
 
 
-def _extract_compact_value(event: Dict[str, Any]) -> Optional[Any]:
+# Each extractor handles one invocation shape (Agent requestBody, Agent
+# parameters list/dict, EventBridge/Step Functions containers, direct call)
+# and returns _NO_COMPACT when the shape does not carry a compact value.
+# A present-but-null "compact" still ends the search, as it always has.
+_NO_COMPACT = object()
+_COMPACT_CONTAINER_KEYS = ("input", "detail", "payload", "requestBody", "body")
+
+
+def _from_requestbody(event: Dict[str, Any]) -> Any:
     rb = _get_json_request_body(event)
     if isinstance(rb, dict) and "compact" in rb:
         return rb.get("compact")
+    return _NO_COMPACT
 
-    if isinstance(event.get("parameters"), list):
-        v = _get_param_from_list(event["parameters"], "compact")
-        if v is not None:
-            return v
 
-    if isinstance(event.get("parameters"), dict):
-        v = event["parameters"].get("compact")
-        if v is not None:
-            return v
+def _from_parameters(event: Dict[str, Any]) -> Any:
+    params = event.get("parameters")
+    if isinstance(params, list):
+        v = _get_param_from_list(params, "compact")
+    elif isinstance(params, dict):
+        v = params.get("compact")
+    else:
+        return _NO_COMPACT
+    return _NO_COMPACT if v is None else v
+
 
-    for k in ("input", "detail", "payload", "requestBody", "body"):
+def _from_container_keys(event: Dict[str, Any]) -> Any:
+    for k in _COMPACT_CONTAINER_KEYS:
         container = event.get(k)
         if isinstance(container, str):
-            j = _maybe_parse_json_string(container)
-            if isinstance(j, dict) and "compact" in j:
-                return j.get("compact")
-        elif isinstance(container, dict):
-            if "compact" in container:
-                return container.get("compact")
+            container = _maybe_parse_json_string(container)
+        if isinstance(container, dict) and "compact" in container:
+            return container.get("compact")
+    return _NO_COMPACT
 
-    if "compact" in event:
-        return event.get("compact")
 
+def _from_root(event: Dict[str, Any]) -> Any:
+    return event.get("compact") if "compact" in event else _NO_COMPACT
+
+
+_COMPACT_EXTRACTORS = (
+    _from_requestbody,
+    _from_parameters,
+    _from_container_keys,
+    _from_root,
+)
+
+
+def _extract_compact_value(event: Dict[str, Any]) -> Optional[Any]:
+    for fn in _COMPACT_EXTRACTORS:
+        v = fn(event)
+        if v is not _NO_COMPACT:
+            return v
     return None
 
 
@@ -240,8 +322,8 @@ def s3_get_json(bucket: str, key: str) -> Optional[Any]:
         return None
     try:
         obj = S3.get_object(Bucket=bucket, Key=key)
-        data = obj["Body"].read()
-        return json.loads(data.decode("utf-8"))
+        # json.loads takes the bytes as-is; no separate decoded str copy
+        return json.loads(obj["Body"].read())
     except botocore.exceptions.ClientError as e:
         code = e.response.get("Error", {}).get("Code")
         if code not in ("NoSuchKey", "NoSuchBucket", "AccessDenied"):
@@ -252,9 +334,42 @@ def s3_get_json(bucket: str, key: str) -> Optional[Any]:
         return None
 
 
-def whitelist_hit(cfg: Any, addr: Optional[str], dom: Optional[str]) -> bool:
-    if not cfg:
-        return False
+def _cfg_json(key: str) -> Optional[Any]:
+    """
+    s3_get_json for CFG_BUCKET, backed by a /tmp copy that is trusted for
+    CFG_TMP_TTL_S seconds. Only successful S3 reads are written back.
+    """
+    if not (CFG_BUCKET and key):
+        return None
+    path = os.path.join(CFG_TMP_DIR, "cfg-" + re.sub(r"[^\w.-]", "_", key))
+    try:
+        if os.path.getmtime(path) > time.time() - CFG_TMP_TTL_S:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.info("cfg tmp read %s failed: %s", path, e)
+
+    data = s3_get_json(CFG_BUCKET, key)
+    if data is not None:
+        try:
+            tmp = f"{path}.{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)  # atomic, so readers never see a partial file
+        except Exception as e:
+            log.info("cfg tmp write %s failed: %s", path, e)
+    return data
+
+
+def _compile_whitelist(cfg: Any) -> Optional[Tuple[bool, frozenset, frozenset]]:
+    """
+    Normalize a whitelist config once: (cfg was non-empty, addresses, domains),
+    all lowercased. None when there is no config.
+    """
+    if cfg is None:
+        return None
     addrs = set()
     doms = set()
     if isinstance(cfg, dict):
@@ -270,52 +385,216 @@ def whitelist_hit(cfg: Any, addr: Optional[str], dom: Optional[str]) -> bool:
         for x in cfg:
             s = str(x).lower()
             (addrs if "@" in s else doms).add(s)
+    return bool(cfg), frozenset(addrs), frozenset(doms)
+
+
+def whitelist_hit(wl: Tuple[bool, frozenset, frozenset], addr: Optional[str], dom: Optional[str]) -> bool:
+    present, addrs, doms = wl
+    if not present:
+        return False
     a = (addr or "").lower()
     d = (dom or "").lower()
     return (a and a in addrs) or (d and d in doms)
 
 
-def account_status(cfg: Any, addr: Optional[str], dom: Optional[str]) -> Optional[str]:
-    if not cfg:
+_ACC_BUCKETS = ("blocked", "deny", "quarantine", "ok", "allow")
+
+
+def _compile_account_status(cfg: Any) -> Optional[Tuple[dict, dict, Dict[str, Tuple[int, str]]]]:
+    """
+    Normalize an account-status config once: (emails map, domains map,
+    lowercased list entry -> (precedence, bucket)). None when there is no
+    usable config.
+    """
+    if not cfg or not isinstance(cfg, dict):
         return None
+    emails = cfg.get("emails") or {}
+    domains = cfg.get("domains") or {}
+    buckets: Dict[str, Tuple[int, str]] = {}
+    for i, bucket in enumerate(_ACC_BUCKETS):
+        lst = cfg.get(bucket)
+        if isinstance(lst, list):
+            for x in lst:
+                buckets.setdefault(str(x).lower(), (i, bucket))
+    return (
+        emails if isinstance(emails, dict) else {},
+        domains if isinstance(domains, dict) else {},
+        buckets,
+    )
+
+
+def account_status(acc: Tuple[dict, dict, Dict[str, Tuple[int, str]]], addr: Optional[str], dom: Optional[str]) -> Optional[str]:
+    emails, domains, buckets = acc
     a = (addr or "").lower()
     d = (dom or "").lower()
-    if isinstance(cfg, dict):
-        emails = cfg.get("emails") or {}
-        domains = cfg.get("domains") or {}
-        if isinstance(emails, dict) and a in emails:
-            return str(emails[a])
-        if isinstance(domains, dict) and d in domains:
-            return str(domains[d])
-        for bucket in ("blocked", "deny", "quarantine", "ok", "allow"):
-            lst = cfg.get(bucket)
-            if isinstance(lst, list):
-                ll = [str(x).lower() for x in lst]
-                if a in ll or d in ll:
-                    return bucket
-    return None
+    if a in emails:
+        return str(emails[a])
+    if d in domains:
+        return str(domains[d])
+    # First bucket (in _ACC_BUCKETS order) listing either the address or domain
+    hits = [h for h in (buckets.get(a), buckets.get(d)) if h]
+    return min(hits)[1] if hits else None
+
+
+# Whitelist / account-status configs, normalized and kept for CFG_TMP_TTL_S:
+# name -> (expires_at, compiled)
+_CFG_COMPILED: Dict[str, Tuple[float, Any]] = {}
+
+
+def _load_compiled_cfg(key: str, compile_fn) -> Any:
+    hit = _CFG_COMPILED.get(key)
+    if hit and hit[0] > time.time():
+        return hit[1]
+    cfg = _cfg_json(key)
+    if cfg is None:
+        # Missing or failed read; try again next invocation
+        return None
+    compiled = compile_fn(cfg)
+    _CFG_COMPILED[key] = (time.time() + CFG_TMP_TTL_S, compiled)
+    return compiled
+
+
+def _load_whitelist() -> Optional[Tuple[bool, frozenset, frozenset]]:
+    return _load_compiled_cfg(WL_KEY, _compile_whitelist) if WL_KEY else None
+
+
+def _load_account_status() -> Optional[Tuple[dict, dict, Dict[str, Tuple[int, str]]]]:
+    return _load_compiled_cfg(ACC_KEY, _compile_account_status) if ACC_KEY else None
 
 
 def _ddb_get(table: str, key_name: str, key_val: str) -> Optional[Dict[str, Any]]:
     if not (table and key_val):
         return None
     try:
-        r = DDB.get_item(TableName=table, Key={key_name: {"S": key_val}})
+        r = CACHE_DDB.get_item(TableName=table, Key={key_name: {"S": key_val}})
         return r.get("Item")
     except Exception as e:
         log.warning("DDB get failed %s: %s", table, e)
         return None
 
 
+def _ddb_batch_get(
+    keys: List[Tuple[str, str, str]]
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Fetch one item per (table, key_name, key_val) with a single BatchGetItem.
+    Entries with no table/key come back None, as do failures. Keys DDB leaves
+    unprocessed get one plain GetItem each rather than reading as a cache miss
+    (a miss would cost a full round of OSINT).
+    """
+    out: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+    wanted = [(i, t, k, v) for i, (t, k, v) in enumerate(keys) if t and v]
+    if not wanted:
+        return out
+    if len({(t, k) for _, t, k, _ in wanted}) > len({t for _, t, _, _ in wanted}):
+        # One table asked under two key names can't share a batch request
+        for i, t, k, v in wanted:
+            out[i] = _ddb_get(t, k, v)
+        return out
+    request: Dict[str, Dict[str, Any]] = {}
+    for _, t, k, v in wanted:
+        tkeys = request.setdefault(t, {"Keys": []})["Keys"]
+        if {k: {"S": v}} not in tkeys:
+            tkeys.append({k: {"S": v}})
+    try:
+        r = CACHE_DDB.batch_get_item(RequestItems=request)
+    except Exception as e:
+        log.warning("DDB batch get failed: %s", e)
+        return out
+    responses = r.get("Responses") or {}
+    unprocessed = r.get("UnprocessedKeys") or {}
+    for i, t, k, v in wanted:
+        for item in responses.get(t, []):
+            if item.get(k, {}).get("S") == v:
+                out[i] = item
+                break
+        else:
+            if {k: {"S": v}} in (unprocessed.get(t) or {}).get("Keys", []):
+                out[i] = _ddb_get(t, k, v)
+    return out
+
+
+# In-process memo in front of the DDB domain/IP caches, holding the same items
+# (so a hit renders exactly like a DDB hit): (kind, key) -> (expires_at, item).
+# Insertion-ordered; the oldest entry is evicted when full.
+INTEL_MEMO_TTL_S = int(os.getenv("INTEL_MEMO_TTL_S", "3600"))
+INTEL_MEMO_MAX   = int(os.getenv("INTEL_MEMO_MAX", "512"))
+_INTEL_MEMO: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+
+
+def _memo_get(kind: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+    hit = _INTEL_MEMO.get((kind, key)) if key else None
+    if hit is None:
+        return None
+    if hit[0] <= time.time():
+        _INTEL_MEMO.pop((kind, key), None)
+        return None
+    return hit[1]
+
+
+def _memo_put(kind: str, key: Optional[str], item: Dict[str, Any]):
+    if not key or INTEL_MEMO_MAX <= 0:
+        return
+    _INTEL_MEMO.pop((kind, key), None)
+    while len(_INTEL_MEMO) >= INTEL_MEMO_MAX:
+        _INTEL_MEMO.pop(next(iter(_INTEL_MEMO)))
+    _INTEL_MEMO[(kind, key)] = (time.time() + INTEL_MEMO_TTL_S, item)
+
+
 def _ddb_put(table: str, item: Dict[str, Any]):
     if not table:
         return
     try:
-        DDB.put_item(TableName=table, Item=item)
+        CACHE_DDB.put_item(TableName=table, Item=item)
     except Exception as e:
         log.warning("DDB put failed %s: %s", table, e)
 
 
+# Type tag -> decoder for the cached domain items; other tags are skipped
+_DDB_SKIP = object()
+_DDB_DECODE = {
+    "N": int,
+    "S": lambda x: x,
+    "BOOL": bool,
+    "NULL": lambda x: None if x is True else _DDB_SKIP,
+}
+
+
+def _decode_attrs(item: Dict[str, Any], guarded: bool) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for k, v in item.items():
+        if k in ("domain", "ttl"):
+            continue
+        # Each attribute value carries exactly one type tag
+        tag, raw = next(iter(v.items()), (None, None))
+        decode = _DDB_DECODE.get(tag)
+        if decode is None:
+            continue
+        if guarded:
+            try:
+                val = decode(raw)
+            except Exception:
+                continue
+        else:
+            val = decode(raw)
+        if val is not _DDB_SKIP:
+            out[k] = val
+    return out
+
+
+def _decode_cached_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Plain feature values from a cached domain item. The writer always stores
+    str(int(...)) numbers, so decode in one go and only fall back to the
+    per-attribute guard (dropping bad values) for a malformed legacy item.
+    """
+    try:
+        return _decode_attrs(item, guarded=False)
+    except Exception as e:
+        log.warning("malformed domain cache item: %s", e)
+        return _decode_attrs(item, guarded=True)
+
+
 def _expired(item: Dict[str, Any]) -> bool:
     try:
         ttl = int(item.get("ttl", {"N": "0"})["N"])
@@ -324,22 +603,37 @@ def _expired(item: Dict[str, Any]) -> bool:
         return False
 
 
+def _http_get(
+    url: str, headers: Dict[str, str] = None, params: Dict[str, str] = None
+) -> urllib3.HTTPResponse:
+    # Per-request headers replace the pool's defaults in urllib3, so merge here
+    return HTTP.request(
+        "GET",
+        url,
+        fields=params or None,
+        headers={**HTTP_HEADERS, **headers} if headers else HTTP_HEADERS,
+    )
+
+
+def _resp_text(r: urllib3.HTTPResponse) -> str:
+    m = _CHARSET_RX.search(r.headers.get("content-type", ""))
+    try:
+        return r.data.decode(m.group(1) if m else "utf-8", errors="replace")
+    except LookupError:
+        return r.data.decode("utf-8", errors="replace")
+
+
 def http_json(
     url: str, headers: Dict[str, str] = None, params: Dict[str, str] = None
 ) -> Optional[Any]:
     try:
-        r = SESSION.get(
-            url,
-            headers=headers or {},
-            params=params or {},
-            timeout=HTTP_TIMEOUT,
-        )
-        if r.status_code == 200:
+        r = _http_get(url, headers=headers, params=params)
+        if r.status == 200:
             ctype = r.headers.get("content-type", "")
             if "json" in ctype or url.endswith("output=json"):
-                return r.json()
+                return json.loads(r.data)
             return None
-        if r.status_code == 404:
+        if r.status == 404:
             return {"_status": 404}
     except Exception as e:
         log.info("HTTP fail %s: %s", url, e)
@@ -355,14 +649,28 @@ def crtsh_issuances(domain: str) -> Dict[str, Any]:
     return {"crtsh.count": None}
 
 
+def _securitytxt_at(url: str) -> bool:
+    try:
+        r = _http_get(url)
+        return r.status == 200 and bool(r.data)
+    except Exception:
+        return False
+
+
+_SECURITYTXT_PATHS = ("/.well-known/security.txt", "/security.txt")
+
+
 def securitytxt_present(domain: str) -> Dict[str, Any]:
-    for path in ("/.well-known/security.txt", "/security.txt"):
-        try:
-            r = SESSION.get(f"https://{domain}{path}", timeout=HTTP_TIMEOUT)
-            if r.status_code == 200 and r.text:
-                return {"securitytxt.present": True}
-        except Exception:
-            pass
+    # Both locations are tried at once; whichever answers 200 first decides
+    futs = [
+        FETCH_POOL.submit(_securitytxt_at, f"https://{domain}{path}")
+        for path in _SECURITYTXT_PATHS
+    ]
+    for fut in as_completed(futs):
+        if fut.result():
+            for other in futs:
+                other.cancel()
+            return {"securitytxt.present": True}
     return {"securitytxt.present": False}
 
 
@@ -379,6 +687,22 @@ def urlscan_presence(domain: str) -> Dict[str, Any]:
     return {"urlscan.total": total if isinstance(total, int) else 0}
 
 
+def _rdap_vcard_fn(entities: Any) -> str:
+    # First non-empty vCard "fn" across the RDAP entities, else ""
+    if not isinstance(entities, list):
+        return ""
+    for ent in entities:
+        v = ent.get("vcardArray") if isinstance(ent, dict) else None
+        if not (isinstance(v, list) and len(v) == 2 and isinstance(v[1], list)):
+            continue
+        for row in v[1]:
+            if isinstance(row, list) and len(row) >= 4 and row[0] == "fn":
+                val = row[3]
+                if isinstance(val, str) and val.strip():
+                    return val.strip()
+    return ""
+
+
 def rdap_domain_meta(domain: str) -> Dict[str, Any]:
     data = http_json(f"https://rdap.org/domain/{domain}")
     out: Dict[str, Any] = {"domain.registered_iso": None, "domain.rdap_name": ""}
@@ -391,27 +715,8 @@ def rdap_domain_meta(domain: str) -> Dict[str, Any]:
         out["domain.registered_iso"] = cr.get("eventDate") if cr else None
     except Exception:
         pass
-    try:
-        entities = (
-            data.get("entities", []) if isinstance(data, dict) else []
-        )
-        for ent in entities:
-            v = ent.get("vcardArray")
-            if isinstance(v, list) and len(v) == 2 and isinstance(v[1], list):
-                for row in v[1]:
-                    if (
-                        isinstance(row, list)
-                        and len(row) >= 4
-                        and row[0] == "fn"
-                    ):
-                        val = row[3]
-                        if isinstance(val, str) and val.strip():
-                            out["domain.rdap_name"] = val.strip()
-                            raise StopIteration
-    except StopIteration:
-        pass
-    except Exception:
-        pass
+    entities = data.get("entities") if isinstance(data, dict) else None
+    out["domain.rdap_name"] = _rdap_vcard_fn(entities)
     return out
 
 
@@ -419,14 +724,13 @@ def abuse_ip(ip: str) -> Dict[str, Any]:
     if not ABUSEIPDB_KEY or not ip:
         return {"abuseipdb.score": None}
     try:
-        r = SESSION.get(
+        r = _http_get(
             "https://api.abuseipdb.com/api/v2/check",
             headers={"Key": ABUSEIPDB_KEY, "Accept": "application/json"},
             params={"ipAddress": ip, "maxAgeInDays": "90"},
-            timeout=HTTP_TIMEOUT,
         )
-        if r.status_code == 200:
-            j = r.json()
+        if r.status == 200:
+            j = json.loads(r.data)
             score = ((j or {}).get("data") or {}).get("abuseConfidenceScore")
             return {
                 "abuseipdb.score": int(score) if score is not None else 0
@@ -444,12 +748,12 @@ _LI_HREF_RX = re.compile(
 
 def _fetch_html(url: str) -> Optional[str]:
     try:
-        r = SESSION.get(url, timeout=HTTP_TIMEOUT, allow_redirects=True)
+        r = _http_get(url)
         if (
-            r.status_code == 200
+            r.status == 200
             and "text/html" in (r.headers.get("content-type", ""))
         ):
-            return r.text[:300_000]
+            return _resp_text(r)[:300_000]
     except Exception:
         pass
     return None
@@ -466,20 +770,24 @@ def linkedin_presence_heuristic(domain: str, budget_left) -> Dict[str, Any]:
         f"https://{domain}/company",
         f"https://{domain}/careers",
     ]
-    for u in tests:
-        if budget_left() < 0.20:
-            break
-        html = _fetch_html(u)
-        if not html:
-            continue
-        m = _LI_HREF_RX.search(html)
-        if m:
-            return {
-                "linkedin.presence": True,
-                "linkedin.url": m.group(1),
-                "linkedin.provider": "homepage_scan",
-                "linkedin.query": u,
-            }
+    if budget_left() >= 0.20:
+        # Fetch every page at once; the first page in list order with a link wins
+        futs = [FETCH_POOL.submit(_fetch_html, u) for u in tests]
+        done, not_done = wait(futs, timeout=max(0.0, budget_left() - 0.20))
+        for fut in not_done:
+            fut.cancel()
+        for u, fut in zip(tests, futs):
+            html = fut.result() if fut in done else None
+            if not html:
+                continue
+            m = _LI_HREF_RX.search(html)
+            if m:
+                return {
+                    "linkedin.presence": True,
+                    "linkedin.url": m.group(1),
+                    "linkedin.provider": "homepage_scan",
+                    "linkedin.query": u,
+                }
     return {
         "linkedin.presence": False,
         "linkedin.url": "",
@@ -500,7 +808,7 @@ def _load_org_patterns():
     if not (CFG_BUCKET and ORG_PATTERNS_KEY):
         return _ORG_PATTERNS
     try:
-        cfg = s3_get_json(CFG_BUCKET, ORG_PATTERNS_KEY)
+        cfg = _cfg_json(ORG_PATTERNS_KEY)
         arr = []
         for org in (cfg.get("orgs") or []) if isinstance(cfg, dict) else []:
             name = (org.get("name") or "").strip()
@@ -515,7 +823,14 @@ def _load_org_patterns():
             except Exception:
                 email_rx = None
             arr.append(
-                {"name": name, "domains": domains, "email_rx": email_rx}
+                {
+                    "name": name,
+                    "domains": domains,
+                    "email_rx": email_rx,
+                    # Precomputed for the per-message matchers
+                    "domain_suffixes": tuple("." + d for d in domains),
+                    "etld1_domains": tuple(_etld1(d) for d in domains),
+                }
             )
         _ORG_PATTERNS = arr
     except Exception as e:
@@ -531,7 +846,7 @@ def _load_brand_bases() -> List[str]:
     if not (CFG_BUCKET and BRAND_BASES_KEY):
         return _BRAND_BASES
     try:
-        cfg = s3_get_json(CFG_BUCKET, BRAND_BASES_KEY)
+        cfg = _cfg_json(BRAND_BASES_KEY)
         if isinstance(cfg, dict) and isinstance(cfg.get("bases"), list):
             _BRAND_BASES = [
                 str(x).lower().strip() for x in cfg["bases"] if x
@@ -545,6 +860,16 @@ def _load_brand_bases() -> List[str]:
 
 def _org_identity_features(
     email: Optional[str], claimed_domain: Optional[str]
+) -> Dict[str, Any]:
+    return dict(_org_identity_cached(email, claimed_domain))
+
+
+# Org patterns and brand bases are loaded once per container, so both checks
+# are pure in their arguments; campaigns repeat the same senders/domains.
+# Cached dicts are shared: callers get copies.
+@lru_cache(maxsize=4096)
+def _org_identity_cached(
+    email: Optional[str], claimed_domain: Optional[str]
 ) -> Dict[str, Any]:
     feats = {"org.match": None, "org.name": "", "org.reason": ""}
     patterns = _load_org_patterns()
@@ -556,13 +881,10 @@ def _org_identity_features(
         feats["org.reason"] = "no_domain"
         return feats
 
-    def domain_matches(o_domains: List[str], cd: str) -> bool:
-        for d in o_domains:
-            if cd == d or cd.endswith("." + d):
-                return True
-        return False
+    def domain_matches(o: Dict[str, Any], cd: str) -> bool:
+        return cd in o["domains"] or cd.endswith(o["domain_suffixes"])
 
-    cand = next((o for o in patterns if domain_matches(o["domains"], cd)), None)
+    cand = next((o for o in patterns if domain_matches(o, cd)), None)
     if not cand:
         feats["org.match"] = False
         feats["org.reason"] = "domain_not_in_org"
@@ -575,9 +897,8 @@ def _org_identity_features(
         feats["org.reason"] = "missing_email"
         return feats
 
-    ok = bool(cand["email_rx"].search(em)) if cand["email_rx"] else any(
-        (em.split("@")[-1] == d) or (em.split("@")[-1].endswith("." + d))
-        for d in cand["domains"]
+    ok = bool(cand["email_rx"].search(em)) if cand["email_rx"] else domain_matches(
+        cand, em.rpartition("@")[2]
     )
     feats["org.match"] = ok
     feats["org.reason"] = "" if ok else "email_regex_fail"
@@ -601,45 +922,46 @@ _HOMOGLYPHS = {
 }
 
 
+_HOMOGLYPH_TABLE = str.maketrans(_HOMOGLYPHS)
+_RN_RX = re.compile(r"[rR][nN]")
+# Byte-level twins for the (usual) all-ASCII domain; punycode is ASCII too
+_HOMOGLYPH_BYTES = bytes(ord(_HOMOGLYPHS.get(chr(i), chr(i))) for i in range(256))
+_RN_RX_BYTES = re.compile(rb"[rR][nN]")
+
+
 def _collapse_bigram_rn(s: str) -> str:
-    return s.replace("rn", "m").replace("rN", "m").replace("Rn", "m").replace(
-        "RN", "m"
-    )
+    return _RN_RX.sub("m", s)
 
 
 def _norm(s: str) -> str:
-    t = _collapse_bigram_rn(s)
-    return "".join(_HOMOGLYPHS.get(ch, ch) for ch in t).lower()
+    if s.isascii():
+        b = _RN_RX_BYTES.sub(b"m", s.encode("ascii"))
+        return b.translate(_HOMOGLYPH_BYTES).lower().decode("ascii")
+    return _collapse_bigram_rn(s).translate(_HOMOGLYPH_TABLE).lower()
 
 
-def _dl_dist(a: str, b: str) -> int:
+def _within_one_edit(a: str, b: str) -> bool:
+    """
+    True when a and b are at most one Damerau-Levenshtein edit apart: equal,
+    or one substitution, insertion, deletion or adjacent transposition apart.
+    Linear, and bails on the length check before touching the strings.
+    """
     len_a, len_b = len(a), len(b)
-    INF = len_a + len_b
-    d = [[0] * (len_b + 2) for _ in range(len_a + 2)]
-    d[0][0] = INF
-    for i in range(len_a + 1):
-        d[i + 1][1] = i
-        d[i + 1][0] = INF
-    for j in range(len_b + 1):
-        d[1][j + 1] = j
-        d[0][j + 1] = INF
-    last: Dict[str, int] = {}
-    for i in range(1, len_a + 1):
-        db = 0
-        for j in range(1, len_b + 1):
-            i1 = last.get(b[j - 1], 0)
-            j1 = db
-            cost = 0 if a[i - 1] == b[j - 1] else 1
-            if cost == 0:
-                db = j
-            d[i + 1][j + 1] = min(
-                d[i][j] + cost,
-                d[i + 1][j] + 1,
-                d[i][j + 1] + 1,
-                d[i1][j1] + (i - i1 - 1) + 1 + (j - j1 - 1),
-            )
-        last[a[i - 1]] = i
-    return d[len_a + 1][len_b + 1]
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+    if len_b - len_a > 1:
+        return False
+    # Skip the common prefix; the first mismatch decides the edit
+    i = 0
+    while i < len_a and a[i] == b[i]:
+        i += 1
+    if i == len_a:
+        return True
+    if len_a != len_b:
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (
+        i + 1 < len_a and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    )
 
 
 def _etld1(domain: str) -> str:
@@ -647,21 +969,56 @@ def _etld1(domain: str) -> str:
     return ".".join(parts[-2:]) if len(parts) >= 2 else (domain or "").lower()
 
 
+_CANDIDATE_BASES = None
+
+
 def _candidate_bases_for_typosquat() -> List[str]:
+    # The org/brand config is fixed for the container's lifetime, so is this
+    global _CANDIDATE_BASES
+    if _CANDIDATE_BASES is not None:
+        return _CANDIDATE_BASES
     bases: List[str] = []
     for org in _load_org_patterns():
-        bases.extend([_etld1(d) for d in org.get("domains", [])])
-    bases.extend([_etld1(b) for b in _load_brand_bases()])
-    out: List[str] = []
-    seen: set[str] = set()
-    for b in bases:
-        if b and b not in seen:
-            seen.add(b)
-            out.append(b)
-    return out
+        bases.extend(org["etld1_domains"])
+    bases.extend(_etld1(b) for b in _load_brand_bases())
+    # dict.fromkeys keeps first-seen order
+    _CANDIDATE_BASES = list(dict.fromkeys(b for b in bases if b))
+    return _CANDIDATE_BASES
+
+
+_TYPO_INDEX = None
+
+
+def _typosquat_index():
+    """
+    Typosquat bases bucketed for lookup, built once per container from the
+    (already cached) org/brand config:
+      by_norm: normalized base -> bases, in candidate order
+      by_len:  len(normalized base) -> [(order, base, normalized base)]
+      puny:    bases that are punycode
+    """
+    global _TYPO_INDEX
+    if _TYPO_INDEX is None:
+        by_norm: Dict[str, List[str]] = {}
+        by_len: Dict[int, List[Tuple[int, str, str]]] = {}
+        puny: List[str] = []
+        bases = _candidate_bases_for_typosquat()
+        for i, base_etld in enumerate(bases):
+            base_norm = _norm(base_etld)
+            by_norm.setdefault(base_norm, []).append(base_etld)
+            by_len.setdefault(len(base_norm), []).append((i, base_etld, base_norm))
+            if "xn--" in base_etld:
+                puny.append(base_etld)
+        _TYPO_INDEX = (by_norm, by_len, puny, len(bases))
+    return _TYPO_INDEX
 
 
 def _typosquat_features(candidate_domain: Optional[str]) -> Dict[str, Any]:
+    return dict(_typosquat_cached(candidate_domain))
+
+
+@lru_cache(maxsize=4096)
+def _typosquat_cached(candidate_domain: Optional[str]) -> Dict[str, Any]:
     feats = {
         "typosquatting.suspect": False,
         "typosquatting.closest_to": "",
@@ -670,35 +1027,44 @@ def _typosquat_features(candidate_domain: Optional[str]) -> Dict[str, Any]:
     cand = (candidate_domain or "").lower().strip()
     if not cand:
         return feats
-    bases = _candidate_bases_for_typosquat()
-    if not bases:
+    by_norm, by_len, puny, n_bases = _typosquat_index()
+    if not n_bases:
         return feats
     cand_etld = _etld1(cand)
     cand_norm = _norm(cand_etld)
-    best = (999, "")
-    reasons: List[str] = []
-    for base_etld in bases:
-        base_norm = _norm(base_etld)
-        if cand_etld == base_etld:
-            continue
-        if "xn--" in cand_etld or "xn--" in base_etld:
-            reasons.append("punycode_idn")
-        if base_norm == cand_norm and base_etld != cand_etld:
+
+    # Homoglyph collision: a different base with the same normalized form
+    same_norm = by_norm.get(cand_norm, ())
+    for base_etld in same_norm:
+        if base_etld != cand_etld:
             return {
                 "typosquatting.suspect": True,
                 "typosquatting.closest_to": base_etld,
                 "typosquatting.reason": "homoglyph_substitution",
             }
-        dist = _dl_dist(base_norm, cand_norm)
-        if dist < best[0]:
-            best = (dist, base_etld)
+
+    # One edit away needs a normalized length within 1 of the candidate's;
+    # keep the earliest such base, as the full scan did
+    best = (999, "")
+    best_order = n_bases
+    n = len(cand_norm)
+    for bucket in (by_len.get(n - 1, ()), by_len.get(n, ()), by_len.get(n + 1, ())):
+        for i, base_etld, base_norm in bucket:
+            if i >= best_order:
+                break
+            if base_etld != cand_etld and _within_one_edit(base_norm, cand_norm):
+                best, best_order = (1, base_etld), i
+                break
     if best[0] <= 1:
         return {
             "typosquatting.suspect": True,
             "typosquatting.closest_to": best[1],
             "typosquatting.reason": "edit_distance<=1",
         }
-    if "punycode_idn" in reasons:
+
+    # Punycode on either side of any comparison against another base
+    others = n_bases - (cand_etld in same_norm)
+    if others and ("xn--" in cand_etld or any(b != cand_etld for b in puny)):
         return {
             "typosquatting.suspect": True,
             "typosquatting.closest_to": "",
@@ -717,7 +1083,9 @@ def bump_sender_graph(from_addr: Optional[str], domain: Optional[str]):
     try:
         pk = f"dom#{domain}"
         now = str(NOW())
-        DDB.update_item(
+        # UPDATED_NEW hands back seen_count/first_seen/last_seen as written
+        # (every attribute the expression touches), so no read-back is needed
+        dom = DDB.update_item(
             TableName=DDB_GRAPH,
             Key={"pk": {"S": pk}, "sk": {"S": "meta"}},
             UpdateExpression=(
@@ -725,9 +1093,11 @@ def bump_sender_graph(from_addr: Optional[str], domain: Optional[str]):
                 "SET last_seen=:now, first_seen = if_not_exists(first_seen, :now)"
             ),
             ExpressionAttributeValues={":one": {"N": "1"}, ":now": {"N": now}},
-        )
+            ReturnValues="UPDATED_NEW",
+        ).get("Attributes", {})
+        addr = {}
         if from_addr:
-            DDB.update_item(
+            addr = DDB.update_item(
                 TableName=DDB_GRAPH,
                 Key={"pk": {"S": pk}, "sk": {"S": f"addr#{from_addr}"}},
                 UpdateExpression=(
@@ -735,17 +1105,8 @@ def bump_sender_graph(from_addr: Optional[str], domain: Optional[str]):
                     "SET last_seen=:now, first_seen = if_not_exists(first_seen, :now)"
                 ),
                 ExpressionAttributeValues={":one": {"N": "1"}, ":now": {"N": now}},
-            )
-        dom = DDB.get_item(
-            TableName=DDB_GRAPH,
-            Key={"pk": {"S": pk}, "sk": {"S": "meta"}},
-        ).get("Item", {})
-        addr = {}
-        if from_addr:
-            addr = DDB.get_item(
-                TableName=DDB_GRAPH,
-                Key={"pk": {"S": pk}, "sk": {"S": f"addr#{from_addr}"}},
-            ).get("Item", {})
+                ReturnValues="UPDATED_NEW",
+            ).get("Attributes", {})
         return {
             "graph.first_time_domain": (
                 "first_seen" in dom
@@ -917,38 +1278,216 @@ def _render_flat_kv(features: Dict[str, Any]) -> str:
 
 
 def _flatten_dict(d, prefix=""):
-    for k, v in (d or {}).items():
-        key = f"{prefix}.{k}" if prefix else k
-        if isinstance(v, dict):
-            yield from _flatten_dict(v, key)
+    # Iterative depth-first walk; same (key, value) order as recursing would give
+    out: List[Tuple[str, Any]] = []
+    stack = [(prefix, iter((d or {}).items()))]
+    while stack:
+        p, items = stack[-1]
+        for k, v in items:
+            key = f"{p}.{k}" if p else k
+            if isinstance(v, dict):
+                stack.append((key, iter(v.items())))
+                break
+            out.append((key, v))
         else:
-            yield key, v
+            stack.pop()
+    return out
+
+
+# json.dumps(v, ensure_ascii=False) would build a new encoder for every cell
+_cell_json = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _cell(v) -> str:
+    try:
+        return _cell_json(v)
+    except Exception:
+        return str(v)
 
 
 def _features_table_md(features: Dict[str, Any]) -> str:
-    rows = ["| Check | Value |", "|---|---|"]
-    for k, v in _flatten_dict(features):
-        try:
-            val = json.dumps(v, ensure_ascii=False)
-        except Exception:
-            val = str(v)
-        rows.append(f"| {k} | {val} |")
-    return "\n".join(rows)
+    flat = _flatten_dict(features)
+    # Features are plain JSON values, so encode them all in one pass and only
+    # take the per-cell fallback if something in there isn't serializable
+    try:
+        cells = [_cell_json(v) for _, v in flat]
+    except Exception:
+        cells = [_cell(v) for _, v in flat]
+    return "\n".join(
+        ["| Check | Value |", "|---|---|"]
+        + [f"| {k} | {val} |" for (k, _), val in zip(flat, cells)]
+    )
+
 
+# Shared read-only stand-in for a missing compact sub-object
+_EMPTY = types.MappingProxyType({})
 
-def _validate_compact_origin(c: Dict[str, Any]) -> Optional[str]:
+
+def _validate_compact_origin(
+    c: Dict[str, Any], from_obj: Any = None, env: Any = None
+) -> Optional[str]:
     if not isinstance(c, dict):
         return "compact must be an object"
     if c.get("provenance") != "controller-mime-extract":
         return "compact missing required provenance 'controller-mime-extract'"
-    if not ((c.get("from") or {}).get("addr")):
+    if from_obj is None:
+        from_obj = c.get("from") or _EMPTY
+    if env is None:
+        env = c.get("envelope") or _EMPTY
+    if not from_obj.get("addr"):
         return "compact.from.addr missing"
-    if not ((c.get("envelope") or {}).get("client_ip")):
+    if not env.get("client_ip"):
         if "envelope" not in c:
             return "compact.envelope missing"
     return None
 
 
+def _cached_osint(
+    from_domain: Optional[str], client_ip: Optional[str], time_left
+) -> Dict[str, Any]:
+    """
+    Domain/IP intel: cached items where available, otherwise the OSINT probes
+    (run concurrently within the budget), written back to the caches.
+    """
+    feats: Dict[str, Any] = {}
+
+    # Domain- and IP-level caches: in-process memo first, then DDB for
+    # whatever it missed, fetched in one round trip
+    dom_item = _memo_get("dom", from_domain)
+    ip_item = _memo_get("ip", client_ip)
+    ddb_dom, ddb_ip = _ddb_batch_get(
+        [
+            (DDB_DOM if dom_item is None else "", "domain", from_domain or ""),
+            (DDB_IP if ip_item is None else "", "ip", client_ip or ""),
+        ]
+    )
+    if ddb_dom and not _expired(ddb_dom):
+        dom_item = ddb_dom
+        _memo_put("dom", from_domain, ddb_dom)
+    if ddb_ip and not _expired(ddb_ip):
+        ip_item = ddb_ip
+        _memo_put("ip", client_ip, ddb_ip)
+    if dom_item and _expired(dom_item):
+        dom_item = None
+    if ip_item and _expired(ip_item):
+        ip_item = None
+
+    # Fan out OSINT for whatever missed the cache, then collect within budget.
+    # Results are merged below in the same order the serial probes ran.
+    dom_probes: List[Future] = []
+    dom_osint = not dom_item and bool(from_domain) and time_left() > 0.15
+    if dom_osint:
+        if time_left() > 0.20:
+            dom_probes.append(OSINT_POOL.submit(rdap_domain_meta, from_domain))
+        if time_left() > 0.20:
+            dom_probes.append(
+                OSINT_POOL.submit(linkedin_presence_heuristic, from_domain, time_left)
+            )
+        if time_left() > 0.15:
+            dom_probes.append(OSINT_POOL.submit(securitytxt_present, from_domain))
+        if time_left() > 0.20:
+            dom_probes.append(OSINT_POOL.submit(urlscan_presence, from_domain))
+        if time_left() > 1.0:
+            dom_probes.append(OSINT_POOL.submit(crtsh_issuances, from_domain))
+    ip_probe: Optional[Future] = None
+    if not ip_item and client_ip and time_left() > 0.20:
+        ip_probe = OSINT_POOL.submit(abuse_ip, client_ip)
+
+    pending = dom_probes + ([ip_probe] if ip_probe else [])
+    done = set()
+    if pending:
+        done, not_done = wait(pending, timeout=max(0.0, time_left()))
+        for fut in not_done:
+            # Queued probes are dropped; running ones end on HTTP_TIMEOUT
+            fut.cancel()
+
+    def probe_result(fut: Future) -> Dict[str, Any]:
+        if fut not in done:
+            return {}
+        try:
+            return fut.result()
+        except Exception as e:
+            log.info("OSINT probe failed: %s", e)
+            return {}
+
+    # Domain-level cache + OSINT
+    if dom_item:
+        feats.update(_decode_cached_item(dom_item))
+        feats["cache.domain_hit"] = True
+    else:
+        feats["cache.domain_hit"] = False
+        if dom_osint:
+            for fut in dom_probes:
+                feats.update(probe_result(fut))
+
+            item: Dict[str, Dict[str, Any]] = {
+                "domain": {"S": from_domain},
+                "ttl": {"N": str(NOW() + DDB_TTL_DOM)},
+                "domain.registered_iso": {
+                    "S": str(feats.get("domain.registered_iso") or "")
+                },
+                "domain.rdap_name": {
+                    "S": str(feats.get("domain.rdap_name") or "")
+                },
+                "securitytxt.present": {
+                    "BOOL": bool(feats.get("securitytxt.present", False))
+                },
+                "urlscan.total": {
+                    "N": str(int(feats.get("urlscan.total") or 0))
+                },
+            }
+            crt_val = feats.get("crtsh.count", None)
+            item["crtsh.count"] = (
+                {"NULL": True}
+                if crt_val is None
+                else {"N": str(int(crt_val))}
+            )
+            lp = feats.get("linkedin.presence", None)
+            item["linkedin.presence"] = (
+                {"NULL": True}
+                if lp is None
+                else {"BOOL": bool(lp)}
+            )
+            item["linkedin.url"] = {
+                "S": str(feats.get("linkedin.url") or "")
+            }
+            _ddb_put(DDB_DOM, item)
+            _memo_put("dom", from_domain, item)
+
+    # IP-level cache + OSINT
+    if ip_item:
+        if "abuseipdb.score" in ip_item and "N" in ip_item["abuseipdb.score"]:
+            feats["abuseipdb.score"] = int(
+                ip_item["abuseipdb.score"]["N"]
+            )
+        feats["cache.ip_hit"] = True
+    else:
+        feats["cache.ip_hit"] = False
+        if ip_probe:
+            f_ip = probe_result(ip_probe)
+            feats.update(f_ip)
+            item = {
+                "ip": {"S": client_ip},
+                "ttl": {"N": str(NOW() + DDB_TTL_IP)},
+            }
+            if f_ip.get("abuseipdb.score") is not None:
+                item["abuseipdb.score"] = {
+                    "N": str(int(f_ip["abuseipdb.score"]))
+                }
+            _ddb_put(DDB_IP, item)
+            _memo_put("ip", client_ip, item)
+
+    return feats
+
+
+# Load static config during init, which runs at full CPU before the first
+# request; the loaders cache in module globals and never raise.
+if CFG_BUCKET:
+    _load_org_entities()
+    _load_org_patterns()
+    _load_brand_bases()
+
+
 def handler(event, context):
     t_start = time.time()
     try:
@@ -956,7 +1495,12 @@ def handler(event, context):
             return BUDGET_S - (time.time() - t_start)
 
         c = _normalize_event_to_compact_obj(event)
-        err = _validate_compact_origin(c)
+        # compact.from / compact.envelope, looked up once for the whole handler
+        from_obj = env = _EMPTY
+        if isinstance(c, dict):
+            from_obj = c.get("from") or _EMPTY
+            env = c.get("envelope") or _EMPTY
+        err = _validate_compact_origin(c, from_obj=from_obj, env=env)
         if err:
             msg = {
                 "error": err,
@@ -966,9 +1510,9 @@ def handler(event, context):
                 return _wrap_openapi_json(event, msg, status_code=400)
             return _wrap_function_response(event, msg)
 
-        from_addr   = (c.get("from") or {}).get("addr")
+        from_addr   = from_obj.get("addr")
         from_domain = (from_addr or "@").split("@")[-1] if from_addr else None
-        client_ip   = (c.get("envelope") or {}).get("client_ip")
+        client_ip   = env.get("client_ip")
 
         claimed_org_domain = None
         if isinstance(event.get("sender"), dict):
@@ -991,135 +1535,37 @@ def handler(event, context):
             features["org"] = dict(org_entity)
 
         # Whitelist / account status from cfg
-        wl_cfg = acc_cfg = None
+        wl = acc = None
         if CFG_BUCKET and time_left() > 0.20:
-            if WL_KEY:
-                wl_cfg = s3_get_json(CFG_BUCKET, WL_KEY)
-            if ACC_KEY:
-                acc_cfg = s3_get_json(CFG_BUCKET, ACC_KEY)
+            wl = _load_whitelist()
+            acc = _load_account_status()
 
         if from_addr or from_domain:
             features["whitelist.hit"] = (
-                whitelist_hit(wl_cfg, from_addr, from_domain)
-                if wl_cfg is not None
+                whitelist_hit(wl, from_addr, from_domain)
+                if wl is not None
                 else None
             )
-            st = account_status(acc_cfg, from_addr, from_domain) if acc_cfg is not None else None
+            st = account_status(acc, from_addr, from_domain) if acc is not None else None
             if st is not None:
                 features["account.status"] = st
 
-        # Domain-level cache + OSINT
-        dom_item = (
-            _ddb_get(DDB_DOM, "domain", from_domain)
-            if (DDB_DOM and from_domain)
-            else None
-        )
-        if dom_item and _expired(dom_item):
-            dom_item = None
-        if dom_item:
-            for k, v in dom_item.items():
-                if k in ("domain", "ttl"):
-                    continue
-                if "N" in v:
-                    try:
-                        features[k] = int(v["N"])
-                    except Exception:
-                        pass
-                elif "S" in v:
-                    features[k] = v["S"]
-                elif "BOOL" in v:
-                    features[k] = bool(v["BOOL"])
-                elif "NULL" in v and v["NULL"] is True:
-                    features[k] = None
-            features["cache.domain_hit"] = True
-        else:
-            features["cache.domain_hit"] = False
-            if from_domain and time_left() > 0.15:
-                if time_left() > 0.20:
-                    features.update(rdap_domain_meta(from_domain))
-                if time_left() > 0.20:
-                    li = linkedin_presence_heuristic(from_domain, time_left)
-                    for k in (
-                        "linkedin.presence",
-                        "linkedin.url",
-                        "linkedin.provider",
-                        "linkedin.query",
-                    ):
-                        if k in li:
-                            features[k] = li[k]
-                if time_left() > 0.15:
-                    features.update(securitytxt_present(from_domain))
-                if time_left() > 0.20:
-                    features.update(urlscan_presence(from_domain))
-                if time_left() > 1.0:
-                    features.update(crtsh_issuances(from_domain))
-
-                if DDB_DOM:
-                    item: Dict[str, Dict[str, Any]] = {
-                        "domain": {"S": from_domain},
-                        "ttl": {"N": str(NOW() + DDB_TTL_DOM)},
-                        "domain.registered_iso": {
-                            "S": str(features.get("domain.registered_iso") or "")
-                        },
-                        "domain.rdap_name": {
-                            "S": str(features.get("domain.rdap_name") or "")
-                        },
-                        "securitytxt.present": {
-                            "BOOL": bool(features.get("securitytxt.present", False))
-                        },
-                        "urlscan.total": {
-                            "N": str(int(features.get("urlscan.total") or 0))
-                        },
-                    }
-                    crt_val = features.get("crtsh.count", None)
-                    item["crtsh.count"] = (
-                        {"NULL": True}
-                        if crt_val is None
-                        else {"N": str(int(crt_val))}
-                    )
-                    lp = features.get("linkedin.presence", None)
-                    item["linkedin.presence"] = (
-                        {"NULL": True}
-                        if lp is None
-                        else {"BOOL": bool(lp)}
-                    )
-                    item["linkedin.url"] = {
-                        "S": str(features.get("linkedin.url") or "")
-                    }
-                    _ddb_put(DDB_DOM, item)
-
-        # IP-level cache + OSINT
-        ip_item = (
-            _ddb_get(DDB_IP, "ip", client_ip)
-            if (DDB_IP and client_ip)
-            else None
-        )
-        if ip_item and _expired(ip_item):
-            ip_item = None
-        if ip_item:
-            if "abuseipdb.score" in ip_item and "N" in ip_item["abuseipdb.score"]:
-                features["abuseipdb.score"] = int(
-                    ip_item["abuseipdb.score"]["N"]
-                )
-            features["cache.ip_hit"] = True
+        # The sender-graph bump is two DDB writes that depend on nothing
+        # below, so it runs alongside the cache lookups and OSINT probes
+        graph_fut = OSINT_POOL.submit(bump_sender_graph, from_addr, from_domain)
+
+        # A whitelisted sender that isn't blocked scores 0 whatever OSINT finds,
+        # so it skips the network probes; its risk.notes just lose the OSINT
+        # lines. Account statuses alone don't skip: OSINT still moves their
+        # score (blocked can reach 100, ok can drop below 5) and notes.
+        acct = str(features.get("account.status") or "").lower()
+        if features.get("whitelist.hit") is True and acct not in ("blocked", "deny"):
+            features["osint.skipped"] = "whitelisted"
         else:
-            features["cache.ip_hit"] = False
-            if client_ip and time_left() > 0.20:
-                f_ip = abuse_ip(client_ip)
-                features.update(f_ip)
-                if DDB_IP:
-                    item = {
-                        "ip": {"S": client_ip},
-                        "ttl": {"N": str(NOW() + DDB_TTL_IP)},
-                    }
-                    if f_ip.get("abuseipdb.score") is not None:
-                        item["abuseipdb.score"] = {
-                            "N": str(int(f_ip["abuseipdb.score"]))
-                        }
-                    _ddb_put(DDB_IP, item)
-
-        # Sender graph features
-        features.update(bump_sender_graph(from_addr, from_domain))
+            features.update(_cached_osint(from_domain, client_ip, time_left))
+
+        # Sender graph features (bump_sender_graph never raises)
+        features.update(graph_fut.result())
 
         # Misc flags from compact
         features.update(
@@ -1135,7 +1581,7 @@ def handler(event, context):
             "claimed_org_domain": claimed_org_domain,
             "message_id": c.get("message_id"),
             "date_iso": c.get("date_iso"),
-            "envelope_mail_from": (c.get("envelope") or {}).get("mail_from"),
+            "envelope_mail_from": env.get("mail_from"),
             "envelope_client_ip": client_ip,
         }
 
@@ -1161,9 +1607,13 @@ def handler(event, context):
         features_nested["flat.kv"] = flat_kv
         table_md = _features_table_md(features_nested)
 
-        # Aliases for agent/frontend
-        features_nested["table_md"] = table_md
-        features_nested["features_table_md"] = table_md
+        if _is_openapi_event(event):
+            # Aliases for agent/frontend
+            features_nested["table_md"] = table_md
+            features_nested["features_table_md"] = table_md
+        else:
+            # Internal callers read the renders from the top level only
+            features_nested.pop("flat.kv", None)
 
         log.info(
             "intel: dom=%s ip=%s score=%s elapsed_ms=%s",
@@ -1,16 +1,40 @@
 import json
 import boto3
 import os
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 
 # --- CONFIGURATION ---
 HITL_TABLE = os.environ.get("HITL_TABLE", "sender_intel_hitl_queue")
 FEEDBACK_TABLE = os.environ.get("FEEDBACK_TABLE", "sender_feedback_table")
 BEDROCK_MODEL_ID = os.environ.get("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0")
+# Wall-time allowed for the streamed completion (function timeout is 60s)
+BEDROCK_BUDGET_S = float(os.environ.get("BEDROCK_BUDGET_S", "45"))
 
-dynamo = boto3.client("dynamodb")
-bedrock = boto3.client("bedrock-runtime")
-s3 = boto3.client("s3")
+# Decision logs are fetched side by side; the connection pool has to be as
+# wide as the thread pool or the extra threads just queue for a connection.
+# Kept-alive connections are reused across warm invocations, and adaptive
+# retries back off client-side instead of piling retries onto a throttle.
+S3_FETCH_WORKERS = 16
+_BOTO_CFG = Config(
+    max_pool_connections=S3_FETCH_WORKERS,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True,
+)
+
+dynamo = boto3.client("dynamodb", config=_BOTO_CFG)
+bedrock = boto3.client("bedrock-runtime", config=_BOTO_CFG)
+s3 = boto3.client("s3", config=_BOTO_CFG)
+# Clients and pool live at module scope so warm invocations reuse them
+S3_POOL = ThreadPoolExecutor(max_workers=S3_FETCH_WORKERS, thread_name_prefix="s3-fetch")
+
+# Past ADVISOR_SHARD_OVER patterns the prompt is split into shards of
+# ADVISOR_SHARD_SIZE that are sent side by side; decode time is per shard
+ADVISOR_SHARD_OVER = 50
+ADVISOR_SHARD_SIZE = 20
+ADVISOR_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="advisor")
 
 # --- KNOWLEDGE BASE: YOUR CURRENT SETUP ---
 # Derived from sender_intel_controller.py and decision_agent_lambda.py
@@ -34,12 +58,49 @@ CURRENT_SYSTEM_CAPABILITIES = """
    - PHI Safety Net: If PHI is detected AND Confidence < 70%, we force HITL Review.
 """
 
+# Static parts of the advisor prompt, rendered once at import; only the
+# patterns JSON between them changes per call
+ADVISOR_PROMPT_HEAD = f"""
+    You are an expert Security Operations Center (SOC) Policy Architect.
+    Your goal is to tune our email security engine by reconciling the difference between the AI's automated assessment and the Human's manual override.
+
+    --- CURRENT SYSTEM CAPABILITIES (DO NOT RECOMMEND IMPLEMENTING THESE) ---
+    {CURRENT_SYSTEM_CAPABILITIES}
+    ------------------------------------------------------------------------
+
+    INPUT DATA:
+    Here are instances where a Human intervened and explicitly disagreed with the System:
+    """
+ADVISOR_PROMPT_TAIL = """
+
+    INSTRUCTIONS:
+    1. Analyze the Conflict: Compare 'system_context' vs 'user_notes'.
+    2. Check Capabilities: Look at CURRENT SYSTEM CAPABILITIES. 
+       - If the user notes mention "spoofing" and we already check DMARC, do NOT say "Implement DMARC". Instead, say "Review DMARC enforcement policy" or "Investigate why DMARC passed for this spoofer."
+       - If the user notes mention "New Domain" and we already check Domain Age, recommend "Increase the Risk Score penalty for domains < 30 days old."
+    3. Generate Recommendations:
+       - NAMED ENTITIES: Whitelist specific vendors mentioned in notes (e.g., "Whitelist 'Dentrix'").
+       - THRESHOLD TUNING: Suggest adjusting specific weights (e.g., "Increase 'Urgency' signal weight" or "Lower 'PHI' confidence threshold").
+       - MISSING LOGIC: Only recommend NEW features if they are strictly absent from the Capabilities list (e.g., "Implement OCR for image-based spam" if not listed).
+
+    OUTPUT FORMAT:
+    Output ONLY a JSON object:
+    {
+      "recommendations": [
+        "Specific, context-aware recommendation 1",
+        "Specific, context-aware recommendation 2"
+      ],
+      "reasoning": "Technical root cause analysis referencing the gap between Current Capabilities and the Human's feedback."
+    }
+    """
+
 def get_full_decision_context(bucket, key):
     if not bucket or not key:
         return None
     try:
         obj = s3.get_object(Bucket=bucket, Key=key)
-        doc = json.loads(obj['Body'].read().decode('utf-8'))
+        # json.loads reads the UTF-8 bytes directly; no decoded str copy
+        doc = json.loads(obj['Body'].read())
         return {
             "ai_decision": doc.get("decision", "UNKNOWN"),
             "ai_confidence": doc.get("summary", {}).get("confidence", 0),
@@ -53,97 +114,166 @@ def get_full_decision_context(bucket, key):
         print(f"❌ Failed to fetch S3 context for {key}: {str(e)}")
         return None
 
+# Signals already present elsewhere in the pattern (domain, from_address,
+# subject_line) are dropped from the copy sent to Bedrock
+_DUP_SIGNALS = ("from_addr", "from_domain", "subject")
+
+def _trim_context(ctx):
+    """Bounded summary of a decision context for the prompt."""
+    if not ctx:
+        return ctx
+    reasons = ctx.get("ai_reasoning") or []
+    if not isinstance(reasons, list):
+        reasons = [reasons]
+    signals = ctx.get("detected_signals") or {}
+    if not isinstance(signals, dict):
+        signals = {}
+    return {
+        "ai_decision": ctx.get("ai_decision"),
+        "ai_confidence": ctx.get("ai_confidence"),
+        "ai_risk_score": ctx.get("ai_risk_score"),
+        "ai_reasoning": [str(r)[:200] for r in reasons[:3]],
+        "detected_signals": {
+            k: v for k, v in signals.items()
+            if k not in _DUP_SIGNALS and v not in (None, "")
+        },
+        "subject_line": str(ctx.get("subject_line") or "")[:120],
+        "from_address": ctx.get("from_address")
+    }
+
+def query_index(table, index, key_attr, key_val, **scan_filter):
+    """
+    All items whose GSI key matches, page by page. Falls back to a Scan
+    (first page only, as before) if the index isn't there yet.
+    """
+    try:
+        paginator = dynamo.get_paginator("query")
+        items = []
+        for page in paginator.paginate(
+            TableName=table,
+            IndexName=index,
+            KeyConditionExpression="#k = :v",
+            ExpressionAttributeNames={"#k": key_attr},
+            ExpressionAttributeValues={":v": {"S": key_val}}
+        ):
+            items.extend(page.get("Items", []))
+        return items
+    except Exception as e:
+        print(f"⚠️ Query on {table}/{index} failed, scanning instead: {str(e)}")
+        return dynamo.scan(TableName=table, **scan_filter).get("Items", [])
+
 def analyze_feedback_patterns():
-    patterns = []
-    print(f"🔍 DEBUG: Scanning HITL Table: '{HITL_TABLE}'")
+    rows = []
+    print(f"🔍 DEBUG: Querying HITL Table: '{HITL_TABLE}'")
     
-    # 1. Scan HITL Queue
+    # 1. Resolved HITL Queue items (status-index)
     try:
-        resp = dynamo.scan(
-            TableName=HITL_TABLE,
+        items = query_index(
+            HITL_TABLE, "status-index", "status", "resolved",
             FilterExpression="#s = :r",
             ExpressionAttributeNames={"#s": "status"},
             ExpressionAttributeValues={":r": {"S": "resolved"}}
         )
-        for item in resp.get("Items", []):
-            notes = item.get("notes", {}).get("S", "").strip()
-            if not notes: continue
-
-            log_bucket = item.get("log_bucket", {}).get("S", "")
-            log_key = item.get("log_key", {}).get("S", "")
-            context = get_full_decision_context(log_bucket, log_key)
-
-            patterns.append({
-                "source": "hitl_queue",
-                "domain": item.get("from_domain", {}).get("S", "unknown"),
-                "verdict": item.get("verdict", {}).get("S", ""),
-                "user_notes": notes, 
-                "system_context": context 
-            })
+        rows.extend(("hitl_queue", item) for item in items)
     except Exception as e:
-        print(f"❌ ERROR scanning HITL table: {str(e)}")
+        print(f"❌ ERROR reading HITL table: {str(e)}")
 
-    # 2. Scan Feedback Table
+    # 2. Feedback with notes (sparse notes-index on has_notes; rows older than
+    # the index are backfilled by backfill_has_notes.py on deploy)
     try:
-        resp = dynamo.scan(TableName=FEEDBACK_TABLE)
-        for item in resp.get("Items", []):
-            notes = item.get("notes", {}).get("S", "").strip()
-            if not notes: continue
-
-            log_bucket = item.get("log_bucket", {}).get("S", "")
-            log_key = item.get("log_key", {}).get("S", "")
-            context = get_full_decision_context(log_bucket, log_key)
-            
-            patterns.append({
-                "source": "feedback_table",
-                "domain": item.get("from_domain", {}).get("S", "unknown"),
-                "verdict": item.get("verdict", {}).get("S", ""),
-                "user_notes": notes,
-                "system_context": context
-            })
+        items = query_index(FEEDBACK_TABLE, "notes-index", "has_notes", "1")
+        rows.extend(("feedback_table", item) for item in items)
     except Exception as e:
-        print(f"❌ ERROR scanning Feedback table: {str(e)}")
+        print(f"❌ ERROR reading Feedback table: {str(e)}")
 
-    return patterns
+    # Campaigns produce repeated feedback; keep each (domain, verdict, notes) once
+    qualified, seen = [], set()
+    for source, item in rows:
+        notes = item.get("notes", {}).get("S", "").strip()
+        if not notes: continue
+        domain = item.get("from_domain", {}).get("S", "unknown")
+        verdict = item.get("verdict", {}).get("S", "")
+        if (domain, verdict, notes) in seen: continue
+        seen.add((domain, verdict, notes))
+        log_bucket = item.get("log_bucket", {}).get("S", "")
+        log_key = item.get("log_key", {}).get("S", "")
+        qualified.append((source, domain, verdict, notes, (log_bucket, log_key)))
 
-def ask_bedrock_advisor(analysis_data, current_policy):
-    if not analysis_data.get("patterns"):
-        return ["No written feedback found. Please review emails and add notes to generate insights."]
+    # 3. Fetch each distinct decision log once, concurrently
+    locations = list(dict.fromkeys(q[-1] for q in qualified))
+    contexts = dict(zip(
+        locations,
+        S3_POOL.map(lambda loc: get_full_decision_context(*loc), locations)
+    ))
 
-    print(f"🤖 Sending {len(analysis_data['patterns'])} patterns to Nova Pro ({BEDROCK_MODEL_ID})...")
-
-    prompt = f"""
-    You are an expert Security Operations Center (SOC) Policy Architect.
-    Your goal is to tune our email security engine by reconciling the difference between the AI's automated assessment and the Human's manual override.
-
-    --- CURRENT SYSTEM CAPABILITIES (DO NOT RECOMMEND IMPLEMENTING THESE) ---
-    {CURRENT_SYSTEM_CAPABILITIES}
-    ------------------------------------------------------------------------
-
-    INPUT DATA:
-    Here are instances where a Human intervened and explicitly disagreed with the System:
-    {json.dumps(analysis_data['patterns'], indent=2)}
+    patterns = []
+    for source, domain, verdict, notes, loc in qualified:
+        patterns.append({
+            "source": source,
+            "domain": domain,
+            "verdict": verdict,
+            "user_notes": notes,
+            "system_context": _trim_context(contexts[loc])
+        })
 
-    INSTRUCTIONS:
-    1. Analyze the Conflict: Compare 'system_context' vs 'user_notes'.
-    2. Check Capabilities: Look at CURRENT SYSTEM CAPABILITIES. 
-       - If the user notes mention "spoofing" and we already check DMARC, do NOT say "Implement DMARC". Instead, say "Review DMARC enforcement policy" or "Investigate why DMARC passed for this spoofer."
-       - If the user notes mention "New Domain" and we already check Domain Age, recommend "Increase the Risk Score penalty for domains < 30 days old."
-    3. Generate Recommendations:
-       - NAMED ENTITIES: Whitelist specific vendors mentioned in notes (e.g., "Whitelist 'Dentrix'").
-       - THRESHOLD TUNING: Suggest adjusting specific weights (e.g., "Increase 'Urgency' signal weight" or "Lower 'PHI' confidence threshold").
-       - MISSING LOGIC: Only recommend NEW features if they are strictly absent from the Capabilities list (e.g., "Implement OCR for image-based spam" if not listed).
+    return patterns
 
-    OUTPUT FORMAT:
-    Output ONLY a JSON object:
-    {{
-      "recommendations": [
-        "Specific, context-aware recommendation 1",
-        "Specific, context-aware recommendation 2"
-      ],
-      "reasoning": "Technical root cause analysis referencing the gap between Current Capabilities and the Human's feedback."
-    }}
+def read_json_stream(response, deadline):
     """
+    Assemble the streamed completion text and return the first complete
+    top-level JSON object as soon as its closing brace arrives (the stream is
+    closed early). If the stream ends or the deadline passes first, returns
+    whatever text arrived.
+    """
+    stream = response["body"]
+    buf = []
+    depth, in_str, esc = 0, False, False
+    try:
+        for event in stream:
+            chunk = event.get("chunk")
+            if not chunk:
+                continue
+            ev = json.loads(chunk["bytes"])
+            text = ((ev.get("contentBlockDelta") or {}).get("delta") or {}).get("text") or ""
+            start = 0
+            for i, ch in enumerate(text):
+                if in_str:
+                    if esc:
+                        esc = False
+                    elif ch == "\\":
+                        esc = True
+                    elif ch == '"':
+                        in_str = False
+                elif ch == '"' and depth:
+                    in_str = True
+                elif ch == "{":
+                    if not depth:
+                        buf, start = [], i
+                    depth += 1
+                elif ch == "}" and depth:
+                    depth -= 1
+                    if not depth:
+                        buf.append(text[start:i + 1])
+                        return "".join(buf)
+            buf.append(text[start:])
+            if time.time() > deadline:
+                print("⏱️ Bedrock stream hit its time budget; using partial output")
+                break
+    finally:
+        try:
+            stream.close()
+        except Exception:
+            pass
+    return "".join(buf)
+
+def _advise(patterns, deadline):
+    """One streamed advisor completion over patterns, parsed."""
+    prompt = (
+        ADVISOR_PROMPT_HEAD
+        # Compact: indentation only costs input tokens, the model reads it fine
+        + json.dumps(patterns, separators=(",", ":"))
+        + ADVISOR_PROMPT_TAIL
+    )
 
     body = json.dumps({
         "messages": [
@@ -158,17 +288,60 @@ def ask_bedrock_advisor(analysis_data, current_policy):
         }
     })
 
+    response = bedrock.invoke_model_with_response_stream(
+        modelId=BEDROCK_MODEL_ID,
+        body=body
+    )
+    
+    content = read_json_stream(response, deadline)
+    content = content.replace("```json", "").replace("```", "").strip()
+    
+    return json.loads(content)
+
+def _merge_advice(results):
+    """One advisor answer from several shard answers, recommendations deduped."""
+    recs, reasons, seen = [], [], set()
+    for res in results:
+        if not isinstance(res, dict):
+            continue
+        for rec in res.get("recommendations") or []:
+            k = str(rec).strip().lower()
+            if k and k not in seen:
+                seen.add(k)
+                recs.append(rec)
+        reasoning = res.get("reasoning")
+        if reasoning and reasoning not in reasons:
+            reasons.append(reasoning)
+    return {"recommendations": recs, "reasoning": "\n\n".join(reasons)}
+
+def ask_bedrock_advisor(analysis_data, current_policy):
+    if not analysis_data.get("patterns"):
+        return ["No written feedback found. Please review emails and add notes to generate insights."]
+
+    patterns = analysis_data['patterns']
+    print(f"🤖 Sending {len(patterns)} patterns to Nova Pro ({BEDROCK_MODEL_ID})...")
+
+    deadline = time.time() + BEDROCK_BUDGET_S
     try:
-        response = bedrock.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
-            body=body
-        )
-        
-        resp_body = json.loads(response['body'].read())
-        content = resp_body['output']['message']['content'][0]['text']
-        content = content.replace("```json", "").replace("```", "").strip()
-        
-        return json.loads(content)
+        if len(patterns) <= ADVISOR_SHARD_OVER:
+            return _advise(patterns, deadline)
+
+        shards = [
+            patterns[i:i + ADVISOR_SHARD_SIZE]
+            for i in range(0, len(patterns), ADVISOR_SHARD_SIZE)
+        ]
+        print(f"🧩 Splitting into {len(shards)} advisor calls of up to {ADVISOR_SHARD_SIZE}")
+        futs = [ADVISOR_POOL.submit(_advise, shard, deadline) for shard in shards]
+        results, last_err = [], None
+        for fut in futs:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                print(f"❌ Nova shard failed: {str(e)}")
+                last_err = e
+        if not results:
+            raise last_err
+        return _merge_advice(results)
         
     except Exception as e:
         print(f"❌ Nova invocation failed: {str(e)}")
@@ -1,14 +1,23 @@
 # mime_extract_lambda.py
-import json, base64, binascii, logging, re
-from email import policy
+import os, json, base64, binascii, logging, re
+from email import errors, policy
 from email.parser import BytesParser
 from email.utils import parseaddr, parsedate_to_datetime
 
+from mime_scan import HDR_PARSER, child_parts, clean_bytes, split_head, text_bytes
+
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
+# "parts" is only for dashboards; with it off the ICS check stops at the first hit
+COUNT_PARTS = os.environ.get("MIME_COUNT_PARTS", "1") != "0"
+
 # ---------------- envelope helpers ----------------
 
+# One encoder for every response instead of a new one per json.dumps call;
+# the extract output is a fresh tree, so the circular-reference walk is skipped
+_BODY_JSON = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+
 def _wrap_fn(event, body_obj):
     """Return Bedrock Agent Function schema with TEXT body (kept for compatibility)."""
     action_group = event.get("actionGroup") or "mime"
@@ -20,7 +29,7 @@ def _wrap_fn(event, body_obj):
             "function": function,
             "functionResponse": {
                 "responseBody": {
-                    "TEXT": {"body": json.dumps(body_obj, ensure_ascii=False)}
+                    "TEXT": {"body": _BODY_JSON(body_obj)}
                 }
             },
         },
@@ -52,9 +61,10 @@ def _maybe_json(s):
 
 # ---------------- MIME fetch ----------------
 
-def _get_mime_text(event) -> str:
+def _get_mime_bytes(event) -> bytes:
     """
-    Accepts multiple invocation shapes and returns the FULL MIME as a unicode string.
+    Accepts multiple invocation shapes and returns the FULL MIME as UTF-8 bytes,
+    ready for BytesParser (no str round trip for base64/bytes payloads).
     Supported:
       - Agent function: parameters[{name:'mime_b64'|'mime_raw'}]
       - requestBody.application/json: {'mime_b64' | 'mime_raw' | 'mime'}
@@ -98,50 +108,49 @@ def _get_mime_text(event) -> str:
         b = event.get("body")
         if isinstance(b, (bytes, bytearray)):
             try:
-                return b.decode("utf-8", "replace")
+                return clean_bytes(bytes(b))
             except Exception:
-                return ""
+                return b""
         if isinstance(b, str):
             # APIGW base64?
             if event.get("isBase64Encoded") is True:
                 try:
-                    return base64.b64decode(b).decode("utf-8", "replace")
+                    return clean_bytes(base64.b64decode(b))
                 except Exception:
-                    return ""
+                    return b""
             # maybe a JSON string wrapper?
             j = _maybe_json(b)
             if isinstance(j, dict):
                 if "mime_b64" in j and j["mime_b64"]:
                     try:
-                        return base64.b64decode(j["mime_b64"]).decode("utf-8", "replace")
+                        return clean_bytes(base64.b64decode(j["mime_b64"]))
                     except Exception:
-                        return ""
+                        return b""
                 if j.get("mime_raw") or j.get("mime"):
-                    v = j.get("mime_raw") or j.get("mime")
-                    return v if isinstance(v, str) else str(v)
+                    return text_bytes(j.get("mime_raw") or j.get("mime"))
             # otherwise assume raw MIME in body
-            return b
+            return text_bytes(b)
         if isinstance(b, dict):
             v = b.get("mime_raw") or b.get("mime")
             if v:
-                return v if isinstance(v, str) else str(v)
+                return text_bytes(v)
             vb = b.get("mime_b64")
             if vb:
                 try:
-                    return base64.b64decode(vb).decode("utf-8", "replace")
+                    return clean_bytes(base64.b64decode(vb))
                 except Exception:
-                    return ""
+                    return b""
 
     # 5) Direct fields worked
     if mime_raw:
-        return mime_raw if isinstance(mime_raw, str) else str(mime_raw)
+        return text_bytes(mime_raw)
     if mime_b64:
         try:
-            return base64.b64decode(mime_b64).decode("utf-8", "replace")
+            return clean_bytes(base64.b64decode(mime_b64))
         except Exception:
-            return ""
+            return b""
 
-    return ""
+    return b""
 
 # ---------------- MIME parse ----------------
 
@@ -151,20 +160,86 @@ def _best_effort_client_ip(headers) -> str | None:
     """
     Try to pull an origin client IP from the *last* Received: header (closest to source).
     """
-    recv = headers.get_all("Received", [])
-    if not recv:
-        return None
-    # The earliest hop is typically the *last* Received header in the list
-    try_order = list(recv)[-3:] if len(recv) > 3 else list(recv)
-    for line in reversed(try_order):
-        m = _IP_RX.search(str(line))
+    recv = headers.get_all("Received") or ()
+    # The earliest hop is typically the *last* Received header in the list;
+    # header values are already str, so search them as-is
+    for line in reversed(recv[-3:]):
+        m = _IP_RX.search(line)
         if m:
             return m.group(1)
     return None
 
-def _parse_mime(mime_text: str):
-    # Parse to bytes; preserve all headers/lines
-    msg = BytesParser(policy=policy.default).parsebytes(mime_text.encode("utf-8", "ignore"))
+# Only headers are read; parts are located by mime_scan's boundary scan.
+# Anything unusual falls back to a full parse + walk().
+_MIME_PARSER = BytesParser(policy=policy.default)
+
+def _is_ics(part) -> bool:
+    ctype = (part.get_content_type() or "").lower()
+    fname = (part.get_filename() or "").lower()
+    return ctype == "text/calendar" or bool(fname and fname.endswith(".ics"))
+
+def _scan_raw(raw: bytes, start: int, end: int):
+    head, body_start = split_head(raw, start, end)
+    return _scan_parts(HDR_PARSER.parsebytes(head), raw, body_start, end)
+
+def _scan_parts(hdr, raw: bytes, start: int, end: int):
+    """
+    (has_ics, part_count) for the body raw[start:end] under headers hdr,
+    over the same nodes msg.walk() would visit, or None
+    when the structure needs the real parser (no/unmatched boundary, digest,
+    message/* other than rfc822, a header block without its empty line).
+    Without COUNT_PARTS the count is partial once an ICS part has been found.
+    """
+    if any(isinstance(d, errors.MissingHeaderBodySeparatorDefect) for d in hdr.defects):
+        # The body starts at the stray line, not after the empty one
+        return None
+    has_ics, count = _is_ics(hdr), 1
+    ctype = hdr.get_content_type()
+    if ctype == "message/rfc822":
+        sub = _scan_raw(raw, start, end)
+        if sub is None:
+            return None
+        return has_ics or sub[0], count + sub[1]
+    maintype = hdr.get_content_maintype()
+    if maintype == "message" or ctype == "multipart/digest":
+        return None
+    if maintype != "multipart":
+        return has_ics, count
+
+    children = child_parts(hdr, raw, start, end)
+    if children is None:
+        return None
+    for begin, stop in children:
+        sub = _scan_raw(raw, begin, stop)
+        if sub is None:
+            return None
+        has_ics, count = has_ics or sub[0], count + sub[1]
+        if has_ics and not COUNT_PARTS:
+            break
+    return has_ics, count
+
+def _walk_parts(msg):
+    has_ics = False
+    part_count = 1  # single-part by default
+    try:
+        if msg.is_multipart():
+            part_count = 0
+            for p in msg.walk():
+                part_count += 1
+                if _is_ics(p):
+                    has_ics = True
+                    if not COUNT_PARTS:
+                        break
+        elif _is_ics(msg):
+            has_ics = True
+    except Exception:
+        pass
+    return has_ics, part_count
+
+def _parse_mime(raw: bytes):
+    # Headers only; the body is looked at structurally by _scan_parts
+    head, body_start = split_head(raw, 0, len(raw))
+    msg = HDR_PARSER.parsebytes(head)
 
     # From
     _, from_addr = parseaddr(msg.get("From") or "")
@@ -193,24 +268,15 @@ def _parse_mime(mime_text: str):
     list_unsub = bool(msg.get("List-Unsubscribe"))
 
     # text/calendar or *.ics?
-    has_ics = False
-    part_count = 1  # single-part by default
-    try:
-        if msg.is_multipart():
-            part_count = 0
-            for p in msg.walk():
-                part_count += 1
-                ctype = (p.get_content_type() or "").lower()
-                fname = (p.get_filename() or "").lower()
-                if ctype == "text/calendar" or (fname and fname.endswith(".ics")):
-                    has_ics = True
-        else:
-            ctype = (msg.get_content_type() or "").lower()
-            fname = (msg.get_filename() or "").lower()
-            if ctype == "text/calendar" or (fname and fname.endswith(".ics")):
-                has_ics = True
-    except Exception:
-        pass
+    scanned = None
+    if raw.count(b"\r") == raw.count(b"\r\n"):  # no bare-CR line endings
+        try:
+            scanned = _scan_parts(msg, raw, body_start, len(raw))
+        except Exception:
+            scanned = None
+    if scanned is None:
+        scanned = _walk_parts(_MIME_PARSER.parsebytes(raw))
+    has_ics, part_count = scanned
 
     # Best-effort origin IP from Received:
     client_ip = _best_effort_client_ip(msg)
@@ -225,7 +291,7 @@ def _parse_mime(mime_text: str):
         "has_calendar_ics": has_ics,
         "provenance": "controller-mime-extract",
         # (optional) provide count for dashboards
-        "parts": part_count,
+        "parts": part_count if COUNT_PARTS else None,
     }
 
     sender = {
@@ -242,10 +308,10 @@ def _parse_mime(mime_text: str):
 
 def handler(event, context):
     try:
-        mime_text = _get_mime_text(event)
-        if not mime_text:
+        mime_bytes = _get_mime_bytes(event)
+        if not mime_bytes:
             return _wrap_fn(event, {"error": "Provide 'mime_raw' or 'mime_b64'."})
-        out = _parse_mime(mime_text)
+        out = _parse_mime(mime_bytes)
         return _wrap_fn(event, out)
     except Exception:
         log.exception("mime_extract error")
@@ -0,0 +1,89 @@
+# mime_scan.py
+# Boundary scanning shared by mime_extract_lambda and sender_intel_controller
+# (same bundle). Parts are located by their boundary lines and only their
+# header blocks are parsed; attachment bodies are never fed through the
+# parser, nor copied: parts are (start, end) offsets into the raw message.
+import re
+from email import policy
+from email.parser import BytesHeaderParser
+
+# Parsers keep no per-parse state, so one instance serves every call/thread
+HDR_PARSER = BytesHeaderParser(policy=policy.default)
+_DELIM_TAIL_RX = re.compile(rb"(--)?[ \t]*\r?(?:\n|\Z)")
+
+def text_bytes(v) -> bytes:
+    """Text input as UTF-8 bytes (unencodable surrogates dropped)."""
+    return (v if isinstance(v, str) else str(v)).encode("utf-8", "ignore")
+
+def clean_bytes(b: bytes) -> bytes:
+    """Decoded payload with invalid UTF-8 replaced by U+FFFD; ASCII is as-is."""
+    return b if b.isascii() else b.decode("utf-8", "replace").encode("utf-8")
+
+def split_head(raw: bytes, start: int, end: int):
+    """
+    (header block, body start) for raw[start:end], split at the first empty
+    line like the parser.
+    """
+    for nl in (b"\r\n", b"\n"):
+        if raw.startswith(nl, start, end):
+            return b"", start + len(nl)
+    # Look for the message's own line ending first, then only search the
+    # other style up to that point, so neither find runs through the body
+    k = raw.find(b"\n", start, end)
+    crlf = k >= 0 and raw.find(b"\r\n", start, k + 1) >= 0
+    first, other = (b"\n\r\n", b"\n\n") if crlf else (b"\n\n", b"\n\r\n")
+    i = raw.find(first, start, end)
+    j = raw.find(other, start, i + len(other) - 1 if i >= 0 else end)
+    if j >= 0:
+        i = j
+    if i < 0:
+        return raw[start:end], end
+    i += 1
+    return raw[start:i], i + (2 if raw[i] == 13 else 1)
+
+def delimiters(raw: bytes, sep: bytes, start: int, end: int):
+    """(line start, line end incl. newline, is_close) for each delimiter line."""
+    pos = start
+    while True:
+        i = raw.find(sep, pos, end)
+        if i < 0:
+            return
+        pos = i + len(sep)
+        if i > start and raw[i - 1] != 10:
+            continue
+        m = _DELIM_TAIL_RX.match(raw, pos, end)
+        if m:
+            yield i, m.end(), bool(m.group(1))
+            pos = m.end()
+
+def child_parts(hdr, raw: bytes, start: int, end: int):
+    """
+    (start, end) of each child of the multipart body raw[start:end] under
+    headers hdr, as the parser splits it, or None when it can't be scanned
+    (no/unencodable boundary, no close delimiter, see below).
+    """
+    boundary = hdr.get_boundary()
+    if not boundary:
+        return None
+    try:
+        sep = b"--" + boundary.encode("ascii", "surrogateescape")
+    except UnicodeError:
+        return None
+    bounds, closed = [], False
+    for line_start, line_end, is_close in delimiters(raw, sep, start, end):
+        if bounds and line_start == bounds[-1][1]:
+            # Like the parser, fold a delimiter line straight after another
+            # into it: no empty part between them. A close delimiter folded
+            # that way doesn't end the multipart there, so leave it to walk().
+            if is_close:
+                return None
+            bounds[-1] = (bounds[-1][0], line_end)
+            continue
+        bounds.append((line_start, line_end))
+        if is_close:
+            closed = True
+            break
+    if not closed or len(bounds) < 2:
+        return None
+    # A part runs from after its delimiter line up to the next one
+    return [(begin, stop) for (_, begin), (stop, _) in zip(bounds, bounds[1:])]
@@ -1,20 +1,54 @@
-import json, os, logging
+import json, os, logging, re
+from concurrent.futures import ThreadPoolExecutor, wait
+from operator import itemgetter
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
 CM_REGION = os.getenv("CM_REGION", "us-east-1")
-
-# Try to create Comprehend Medical client once at import
+# Text shorter than CM_MIN_CHARS (default 0: scan everything) or without a
+# single letter or digit can't be worth a billed detect_phi call
+CM_MIN_CHARS = int(os.getenv("CM_MIN_CHARS", "0"))
+_ALNUM_RX = re.compile(r"[^\W_]")
+
+# One encoder for every response instead of a new one per json.dumps call
+_BODY_JSON = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+
+# Try to create Comprehend Medical client once at import; its kept-alive
+# connection is reused across warm invocations
+_BOTO_CFG = Config(
+    connect_timeout=1.0,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+)
 try:
-    cm_client = boto3.client("comprehendmedical", region_name=CM_REGION)
+    cm_client = boto3.client("comprehendmedical", region_name=CM_REGION, config=_BOTO_CFG)
 except Exception as e:
     log.exception("Failed to create Comprehend Medical client")
     cm_client = None
 
 
+def _warm_client():
+    """
+    Open the Comprehend Medical connection during init so the first email
+    doesn't pay the TLS handshake. It has to go through cm_client itself (a
+    client with its own timeouts would pool its own socket), so init only
+    waits up to 2s for it and a slow endpoint is left to finish in the
+    background. The one-character detect_phi is a minimum billed unit per
+    cold start; failures are ignored.
+    """
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cm-warm")
+    wait([pool.submit(cm_client.detect_phi, Text=" ")], timeout=2.0)
+    pool.shutdown(wait=False)
+
+
+if cm_client is not None and os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    _warm_client()
+
+
 def scrub_text(text: str) -> dict:
     """
     Core helper: call Comprehend Medical if available, otherwise
@@ -27,6 +61,14 @@ def scrub_text(text: str) -> dict:
             "model_version": None,
         }
 
+    if len(text) < CM_MIN_CHARS or not _ALNUM_RX.search(text):
+        return {
+            "redacted_email": text,
+            "entities_detected": 0,
+            "model_version": None,
+            "skipped": "below_threshold",
+        }
+
     if cm_client is None:
         return {
             "redacted_email": text,
@@ -39,11 +81,15 @@ def scrub_text(text: str) -> dict:
         result = cm_client.detect_phi(Text=text)
         entities = result.get("Entities", [])
 
-        # Redact in reverse offset order so positions stay valid
-        redacted = text
-        for ent in sorted(entities, key=lambda e: e["BeginOffset"], reverse=True):
+        # One left-to-right pass over the original text, joined once
+        out, pos = [], 0
+        for ent in sorted(entities, key=itemgetter("BeginOffset")):
             start, end = ent["BeginOffset"], ent["EndOffset"]
-            redacted = redacted[:start] + "[REDACTED]" + redacted[end:]
+            out.append(text[pos:start])
+            out.append("[REDACTED]")
+            pos = max(pos, end)
+        out.append(text[pos:])
+        redacted = "".join(out)
 
         return {
             "redacted_email": redacted,
@@ -91,7 +137,7 @@ def lambda_handler(event, context):
                 "function": event.get("function", "scrub_phi"),
                 "functionResponse": {
                     "responseBody": {
-                        "TEXT": {"body": json.dumps(payload, ensure_ascii=False)}
+                        "TEXT": {"body": _BODY_JSON(payload)}
                     }
                 },
             },
@@ -107,7 +153,7 @@ def lambda_handler(event, context):
                 "function": event.get("function", "scrub_phi"),
                 "functionResponse": {
                     "responseBody": {
-                        "TEXT": {"body": json.dumps(payload, ensure_ascii=False)}
+                        "TEXT": {"body": _BODY_JSON(payload)}
                     }
                 },
             },
@@ -5,20 +5,39 @@ import base64
 import logging
 import time
 import uuid
-import datetime
-from email import policy
+from concurrent.futures import ThreadPoolExecutor, wait
+from email import errors, policy
 from email.parser import BytesParser
-
-DDB = boto3.client("dynamodb")
+from botocore.config import Config
+
+# Same bundle: input normalisation and boundary scanning shared with mime_extract
+from mime_scan import HDR_PARSER, child_parts, clean_bytes, split_head, text_bytes
+
+# Kept-alive, pooled connections shared by every AWS call; reused across warm
+# invocations. Lambda invokes wait on the downstream function, so they only
+# get the short connect timeout, not the read timeout.
+# A client's pool must be at least as wide as the calls it can have in flight
+# (every CALL_POOL worker plus the handler thread), or the extra calls queue
+# for a connection instead of running side by side.
+CALL_WORKERS = 8
+_BOTO_CFG = Config(
+    connect_timeout=1.0,
+    read_timeout=5.0,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+    max_pool_connections=2 * CALL_WORKERS,
+)
+_INVOKE_CFG = _BOTO_CFG.merge(Config(read_timeout=30.0))
+
+DDB = boto3.client("dynamodb", config=_BOTO_CFG)
 HITL_TABLE = os.getenv("HITL_TABLE", "")
 FEEDBACK_TABLE = os.getenv("FEEDBACK_TABLE", "sender_feedback_table")
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
-LAMBDA = boto3.client("lambda")
-S3 = boto3.client("s3")
-CW = boto3.client("cloudwatch")
+LAMBDA = boto3.client("lambda", config=_INVOKE_CFG)
+S3 = boto3.client("s3", config=_BOTO_CFG)
 
 MIME_FN = os.environ.get("MIME_FN", "mime_extract_lambda")
 INTEL_FN = os.environ.get("INTEL_FN", "sc-intel")
@@ -29,52 +48,162 @@ DECISIONS_BUCKET = os.environ.get("DECISIONS_BUCKET", "")
 DECISIONS_PREFIX = os.environ.get("DECISIONS_PREFIX", "runs")
 REGION = os.environ.get("AWS_REGION", os.environ.get("AWS_DEFAULT_REGION", "us-east-2"))
 
+# Shared encoders instead of a new one per json.dumps call; everything encoded
+# here is a fresh, acyclic tree, so the circular-reference walk is skipped
+_PAYLOAD_JSON = json.JSONEncoder(check_circular=False).encode
+_RUN_JSON = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+
+# Downstream Lambda calls that don't depend on each other run side by side;
+# the pool is reused across warm invocations.
+CALL_POOL = ThreadPoolExecutor(max_workers=CALL_WORKERS, thread_name_prefix="controller")
+
+
+def _warm_clients():
+    """
+    Open the S3 and DynamoDB connections during init, side by side, so the
+    first email doesn't pay the TLS handshakes. Both calls are covered by the
+    function's existing grants; failures are ignored.
+    """
+    calls = []
+    if DECISIONS_BUCKET:
+        calls.append(lambda: S3.head_bucket(Bucket=DECISIONS_BUCKET))
+    if FEEDBACK_TABLE:
+        calls.append(lambda: DDB.describe_table(TableName=FEEDBACK_TABLE))
+    futs = [CALL_POOL.submit(call) for call in calls]
+    wait(futs, timeout=2.0)
+
+
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    _warm_clients()
 
-def _get_mime_from_event(event):
+
+def _get_mime_from_event(event) -> bytes:
+    """The MIME as UTF-8 bytes; base64 input is never round-tripped via str."""
     if isinstance(event.get("mime_raw"), str):
-        return event["mime_raw"]
+        return text_bytes(event["mime_raw"])
 
     if isinstance(event.get("mime_b64"), str):
         try:
-            return base64.b64decode(event["mime_b64"]).decode("utf-8", "replace")
+            return clean_bytes(base64.b64decode(event["mime_b64"]))
         except Exception:
-            return ""
+            return b""
 
     body = event.get("body")
     if isinstance(body, str):
         if event.get("isBase64Encoded"):
             try:
-                return base64.b64decode(body).decode("utf-8", "replace")
+                return clean_bytes(base64.b64decode(body))
             except Exception:
-                return body
-        return body
+                return text_bytes(body)
+        return text_bytes(body)
 
-    return ""
+    return b""
 
 
-def _parse_mime_basic(mime_raw: str):
-    msg = BytesParser(policy=policy.default).parsebytes(
-        mime_raw.encode("utf-8", "ignore")
-    )
+_BODY_PREF = ("plain", "html")
+# Parsers keep no per-parse state, so one instance serves every call/thread
+_MIME_PARSER = BytesParser(policy=policy.default)
+
+
+class _Unscannable(Exception):
+    """Structure the boundary scan doesn't reproduce; use the full parser."""
+
+
+def _part_headers(raw: bytes, start: int, end: int):
+    head, body = split_head(raw, start, end)
+    hdr = HDR_PARSER.parsebytes(head)
+    if any(isinstance(d, errors.MissingHeaderBodySeparatorDefect) for d in hdr.defects):
+        raise _Unscannable()
+    return hdr, body
+
+
+def _subparts(hdr, raw: bytes, start: int, end: int):
+    """(start, end) of each child of a multipart body, or _Unscannable."""
+    if hdr.get_content_subtype() == "digest":
+        raise _Unscannable()
+    children = child_parts(hdr, raw, start, end)
+    if children is None:
+        raise _Unscannable()
+    return children
+
+
+def _body_candidates(hdr, raw: bytes, start: int, body: int, end: int):
+    """
+    (preference, (start, end)) for the parts msg.get_body(_BODY_PREF) would
+    consider, in the same order; part start/end are offsets into raw.
+    """
+    if hdr.is_attachment():
+        return
+    maintype, subtype = hdr.get_content_type().split("/")
+    if maintype == "text":
+        if subtype in _BODY_PREF:
+            # The line ending before a delimiter belongs to the delimiter
+            if raw.endswith(b"\r\n", start, end):
+                end -= 2
+            elif raw.endswith(b"\n", start, end):
+                end -= 1
+            yield _BODY_PREF.index(subtype), (start, end)
+        return
+    if maintype != "multipart":
+        return
+    children = _subparts(hdr, raw, body, end)
+    if subtype == "related":
+        # Only the root part (start= or else the first) can be the body
+        root = hdr.get_param("start")
+        if root:
+            for child_start, child_end in children:
+                child, child_body = _part_headers(raw, child_start, child_end)
+                if child["content-id"] == root:
+                    yield from _body_candidates(child, raw, child_start, child_body, child_end)
+                    return
+        children = children[:1]
+    for child_start, child_end in children:
+        child, child_body = _part_headers(raw, child_start, child_end)
+        yield from _body_candidates(child, raw, child_start, child_body, child_end)
+
+
+def _scan_body(raw: bytes):
+    """
+    (headers, body part bytes or None) for a multipart message without
+    parsing its attachments, or None when the full parser is needed.
+    """
+    if raw.count(b"\r") != raw.count(b"\r\n"):  # bare-CR line endings
+        return None
+    try:
+        msg, body = _part_headers(raw, 0, len(raw))
+        if msg.get_content_maintype() != "multipart":
+            # A single part is the body; nothing to skip
+            return None
+        best, found = len(_BODY_PREF), None
+        for prio, loc in _body_candidates(msg, raw, 0, body, len(raw)):
+            if prio < best:
+                best, found = prio, loc
+                if prio == 0:
+                    break
+    except Exception:
+        return None
+    return msg, (raw[found[0]:found[1]] if found else None)
+
+
+def _parse_mime_basic(raw: bytes):
+    scanned = _scan_body(raw)
+    msg = scanned[0] if scanned else _MIME_PARSER.parsebytes(raw)
+
     subj = msg.get("Subject") or ""
     msg_id = (msg.get("Message-ID") or "").strip().strip("<>") or None
     from_h = msg.get("From") or ""
     to_h = msg.get("To") or ""
 
-    body_text = ""
+    # One descent, plain preferred over html, attachments skipped; when the
+    # structure was scanned only the chosen part is parsed
     try:
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    body_text = part.get_content()
-                    break
-            if not body_text:
-                for part in msg.walk():
-                    if part.get_content_type() == "text/html":
-                        body_text = part.get_content()
-                        break
+        if scanned is None:
+            part = msg.get_body(preferencelist=_BODY_PREF)
+        elif scanned[1] is not None:
+            part = _MIME_PARSER.parsebytes(scanned[1])
         else:
-            body_text = msg.get_content()
+            part = None
+        body_text = part.get_content() if part is not None else ""
     except Exception:
         body_text = ""
 
@@ -90,35 +219,29 @@ def _parse_mime_basic(mime_raw: str):
 def _invoke_lambda(fn_name: str, payload: dict):
     resp = LAMBDA.invoke(
         FunctionName=fn_name,
-        Payload=json.dumps(payload).encode("utf-8"),
+        Payload=_PAYLOAD_JSON(payload).encode("utf-8"),
     )
-    raw = resp["Payload"].read().decode("utf-8")
+    # json.loads reads the UTF-8 bytes directly; no decoded str copy
+    raw = resp["Payload"].read()
+    if not raw:
+        return {}
     try:
         return json.loads(raw)
     except Exception:
-        log.exception("Failed to parse Lambda %s response: %s", fn_name, raw)
+        log.exception("Failed to parse Lambda %s response: %s", fn_name, raw.decode("utf-8", "replace"))
         return {}
 
 
+def _fn_body(payload: dict):
+    """Decoded TEXT body of a Bedrock function-schema response; raises if absent."""
+    return json.loads(payload["response"]["functionResponse"]["responseBody"]["TEXT"]["body"])
+
+
 def _call_decision_agent(run_doc: dict) -> dict:
     if not DECISION_FN:
         return {}
 
-    event = {"run": run_doc}
-    resp = LAMBDA.invoke(
-        FunctionName=DECISION_FN,
-        InvocationType="RequestResponse",
-        Payload=json.dumps(event).encode("utf-8"),
-    )
-    payload_bytes = resp["Payload"].read()
-    try:
-        if not payload_bytes:
-            return {}
-        decoded = payload_bytes.decode("utf-8")
-        return json.loads(decoded)
-    except Exception:
-        log.exception("Failed to decode decision agent payload")
-        return {}
+    return _invoke_lambda(DECISION_FN, {"run": run_doc})
 
 
 def _call_phi_scrubber(body_text: str):
@@ -140,8 +263,7 @@ def _call_phi_scrubber(body_text: str):
     payload = _invoke_lambda(PHI_FN, event)
 
     try:
-        inner = payload["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
-        data = json.loads(inner)
+        data = _fn_body(payload)
     except Exception:
         log.exception("phi_scrubber parse error")
         data = {
@@ -153,11 +275,12 @@ def _call_phi_scrubber(body_text: str):
     return data
 
 
-def _call_mime_extract(mime_raw: str):
-    payload = _invoke_lambda(MIME_FN, {"mime_raw": mime_raw})
+def _call_mime_extract(mime_raw: bytes):
+    # Sent as text, not mime_b64: JSON-escaped MIME is ~3% over its size,
+    # base64 is 33% and would eat into the invoke payload limit
+    payload = _invoke_lambda(MIME_FN, {"mime_raw": mime_raw.decode("utf-8")})
     try:
-        body = payload["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
-        data = json.loads(body)
+        data = _fn_body(payload)
         return data.get("compact") or {}, data.get("sender") or {}, data.get("auth") or {}
     except Exception:
         log.exception("mime_extract parse error")
@@ -174,9 +297,7 @@ def _call_sender_intel(sender_meta: dict, compact: dict):
 
     if "response" in payload and "functionResponse" in payload.get("response", {}):
         try:
-            inner = payload["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
-            data = json.loads(inner)
-            return data
+            return _fn_body(payload)
         except Exception:
             log.exception(
                 "sender-intel Bedrock-style parse error, falling back to raw payload"
@@ -201,14 +322,28 @@ def _call_context_analyzer(content_compact: dict):
     payload = _invoke_lambda(CONTEXT_FN, event)
 
     try:
-        inner = payload["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
-        data = json.loads(inner)
-        return data
+        return _fn_body(payload)
     except Exception:
         log.exception("context analyzer parse error")
         return None
 
 
+# Trust summaries per domain, reused by warm invocations for TRUST_TTL_S:
+# domain -> (expires_at, summary). Oldest entries go first once full.
+TRUST_TTL_S = float(os.environ.get("TRUST_TTL_S", "60"))
+_TRUST_CACHE_MAX = 2048
+_TRUST_CACHE = {}
+
+# With TRUST_FAST_PATH=1, mail from a domain IT has blocked is quarantined
+# straight away: no context analyzer, sender intel or decision agent calls.
+# Only the block side is short-circuited. The domain comes from the From
+# header, which anyone can forge (and SPF/DKIM/DMARC results are not parsed
+# yet), and a trusted account can be compromised; a fast ALLOW would let
+# either through unanalyzed, so "trusted" senders still get the full run.
+TRUST_FAST_PATH = os.environ.get("TRUST_FAST_PATH", "0") == "1"
+_TRUST_DECISIONS = {"blocked": "QUARANTINE"}
+
+
 def _get_sender_trust(from_domain: str) -> dict:
     """
     Query the feedback table to see if IT has repeatedly allowed/blocked this domain.
@@ -220,6 +355,10 @@ def _get_sender_trust(from_domain: str) -> dict:
     if not FEEDBACK_TABLE or not from_domain:
         return {"tier": None, "allows": 0, "blocks": 0}
 
+    hit = _TRUST_CACHE.get(from_domain)
+    if hit and hit[0] > time.time():
+        return dict(hit[1])
+
     try:
         pk = f"domain#{from_domain}"
         # Get last 10 verdicts
@@ -227,6 +366,9 @@ def _get_sender_trust(from_domain: str) -> dict:
             TableName=FEEDBACK_TABLE,
             KeyConditionExpression="pk = :pk",
             ExpressionAttributeValues={":pk": {"S": pk}},
+            # Only the verdict is counted; leave the rest of each item behind
+            ProjectionExpression="#v",
+            ExpressionAttributeNames={"#v": "verdict"},
             ScanIndexForward=False, # Descending (newest first)
             Limit=10
         )
@@ -248,7 +390,12 @@ def _get_sender_trust(from_domain: str) -> dict:
         elif allows >= 3:
             tier = "trusted" # Consistent history of approvals
             
-        return {"tier": tier, "allows": allows, "blocks": blocks}
+        trust = {"tier": tier, "allows": allows, "blocks": blocks}
+        _TRUST_CACHE.pop(from_domain, None)
+        if len(_TRUST_CACHE) >= _TRUST_CACHE_MAX:
+            _TRUST_CACHE.pop(next(iter(_TRUST_CACHE)))
+        _TRUST_CACHE[from_domain] = (time.time() + TRUST_TTL_S, trust)
+        return dict(trust)
         
     except Exception:
         log.exception("Failed to query sender trust feedback")
@@ -339,38 +486,34 @@ def _compute_decision(sender_raw, content_result):
     )
 
 
+# CloudWatch Embedded Metric Format: the metrics ride along in the log stream
+# and are extracted by CloudWatch Logs, so no API call is made per email
+_EMF_METRICS = [{
+    "Namespace": "SCIntel",
+    "Dimensions": [["Function"]],
+    "Metrics": [
+        {"Name": "EmailsProcessed", "Unit": "Count"},
+        {"Name": "ProcessingTimeMs", "Unit": "Milliseconds"},
+        {"Name": "Quarantined", "Unit": "Count"},
+        {"Name": "HasPHI", "Unit": "Count"},
+    ],
+}]
+
+
 def _emit_metrics(decision, classification, has_phi, elapsed_ms):
     try:
-        dims = [{"Name": "Function", "Value": "sender-intel-controller"}]
-        CW.put_metric_data(
-            Namespace="SCIntel",
-            MetricData=[
-                {
-                    "MetricName": "EmailsProcessed",
-                    "Dimensions": dims,
-                    "Unit": "Count",
-                    "Value": 1,
-                },
-                {
-                    "MetricName": "ProcessingTimeMs",
-                    "Dimensions": dims,
-                    "Unit": "Milliseconds",
-                    "Value": elapsed_ms,
-                },
-                {
-                    "MetricName": "Quarantined",
-                    "Dimensions": dims,
-                    "Unit": "Count",
-                    "Value": 1 if decision == "QUARANTINE" else 0,
-                },
-                {
-                    "MetricName": "HasPHI",
-                    "Dimensions": dims,
-                    "Unit": "Count",
-                    "Value": 1 if has_phi else 0,
-                },
-            ],
-        )
+        # print, not log: the EMF line has to be bare JSON
+        print(json.dumps({
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": _EMF_METRICS,
+            },
+            "Function": "sender-intel-controller",
+            "EmailsProcessed": 1,
+            "ProcessingTimeMs": elapsed_ms,
+            "Quarantined": 1 if decision == "QUARANTINE" else 0,
+            "HasPHI": 1 if has_phi else 0,
+        }))
     except Exception:
         log.exception("failed to emit CloudWatch metrics")
 
@@ -432,19 +575,60 @@ def enqueue_hitl_if_needed(decision_doc: dict, log_bucket: str, log_key: str):
         log.exception("Failed to enqueue HITL item for %s", log_key)
 
 
+def _put_json(key: str, doc) -> None:
+    S3.put_object(
+        Bucket=DECISIONS_BUCKET,
+        Key=key,
+        Body=_RUN_JSON(doc).encode("utf-8"),
+        ContentType="application/json",
+    )
+
+
+def _put_side_json(key: str, doc) -> None:
+    try:
+        _put_json(key, doc)
+    except Exception:
+        log.exception("failed to write %s to S3", key)
+
+
+def _persist_run(log_doc: dict, key: str):
+    """
+    Write the run document to S3, then enqueue it for HITL if needed. The
+    raw sender-intel response (verbose OSINT output, already summarised in
+    sender_intel.features/ids) goes to its own object next to it, written in
+    parallel, and the run document keeps a pointer.
+    """
+    side = None
+    raw = log_doc["sender_intel"].pop("raw", None)
+    if raw:
+        raw_key = key[:-len(".json")] + "_intel.json"
+        log_doc["sender_intel"]["raw_ref"] = {"bucket": DECISIONS_BUCKET, "key": raw_key}
+        side = CALL_POOL.submit(_put_side_json, raw_key, raw)
+    try:
+        _put_json(key, log_doc)
+        # Enqueue HITL item if needed
+        enqueue_hitl_if_needed(log_doc, DECISIONS_BUCKET, key)
+    except Exception:
+        log.exception("failed to write run document to S3")
+    if side is not None:
+        side.result()
+
+
 def handler(event, context):
     t0 = time.time()
     mime_raw = _get_mime_from_event(event)
     if not mime_raw:
         return {"statusCode": 400, "error": "Missing mime_raw/mime_b64/body"}
 
+    # 1) MIME → compact & sender meta; mime_extract only needs the raw
+    # message, so it runs while the message is parsed here for the body
+    mime_fut = CALL_POOL.submit(_call_mime_extract, mime_raw)
     basic = _parse_mime_basic(mime_raw)
 
-    # 1) MIME → compact & sender meta
-    compact, sender_meta, auth = _call_mime_extract(mime_raw)
-
     # 2) PHI scrubber on plain text body
-    phi = _call_phi_scrubber(basic["body"])
+    phi_fut = CALL_POOL.submit(_call_phi_scrubber, basic["body"])
+    compact, sender_meta, auth = mime_fut.result()
+    phi = phi_fut.result()
     red_body = phi.get("redacted_email", basic["body"])
     has_phi = bool(phi.get("entities_detected") and phi["entities_detected"] > 0)
 
@@ -456,15 +640,25 @@ def handler(event, context):
         "from": sender_meta.get("email") or (compact.get("from") or {}).get("addr"),
         "to": basic["to_header"],
     }
-    content_result = _call_context_analyzer(content_compact)
+    fast_tier = None
+    if TRUST_FAST_PATH:
+        trust_feedback = _get_sender_trust(sender_meta.get("domain"))
+        if trust_feedback.get("tier") in _TRUST_DECISIONS:
+            fast_tier = trust_feedback["tier"]
+
+    if fast_tier:
+        content_result, sender_raw = None, {}
+    else:
+        content_fut = CALL_POOL.submit(_call_context_analyzer, content_compact)
 
-    # 4) Sender intel (OSINT + graph, etc.)
-    sender_raw = _call_sender_intel(sender_meta, compact)
-    
-    # 4a) TRUST CACHE LOOKUP (New)
-    ids = sender_raw.get("ids") or {}
-    from_domain = ids.get("from_domain") or (sender_meta.get("domain"))
-    trust_feedback = _get_sender_trust(from_domain)
+        # 4) Sender intel (OSINT + graph, etc.), while the content analyzer runs
+        sender_raw = _call_sender_intel(sender_meta, compact)
+        
+        # 4a) TRUST CACHE LOOKUP (New)
+        ids = sender_raw.get("ids") or {}
+        from_domain = ids.get("from_domain") or (sender_meta.get("domain"))
+        trust_feedback = _get_sender_trust(from_domain)
+        content_result = content_fut.result()
 
     # 5) Baseline decision from sender + content
     (
@@ -477,15 +671,19 @@ def handler(event, context):
         ids,
         note0,
     ) = _compute_decision(sender_raw, content_result)
+    if fast_tier:
+        decision = _TRUST_DECISIONS[fast_tier]
+        reasons = [f"domain {fast_tier} by IT feedback history"]
 
-    now = datetime.datetime.utcnow()
-    iso_now = now.replace(microsecond=0).isoformat() + "Z"
+    # One gmtime() for both the timestamp and the key (UTC, to the second)
+    y, mo, d, h, mi, sec = time.gmtime()[:6]
+    iso_now = "%04d-%02d-%02dT%02d:%02d:%02dZ" % (y, mo, d, h, mi, sec)
     msg_id = basic["message_id"] or ids.get("message_id") or f"nomsg-{uuid.uuid4().hex}"
 
     key = (
         f"{DECISIONS_PREFIX}/"
-        f"{now.year:04d}/{now.month:02d}/{now.day:02d}/"
-        f"{msg_id}_{now.strftime('%H%M%S')}.json"
+        f"{y:04d}/{mo:02d}/{d:02d}/"
+        f"{msg_id}_{h:02d}{mi:02d}{sec:02d}.json"
     )
 
     intent = (note0 or {}).get("intent")
@@ -559,7 +757,7 @@ def handler(event, context):
 
     # 6) Decision agent: can override decision/risk/reasons, but HITL stays downstream.
     decision_agent_out = {}
-    if DECISION_FN:
+    if DECISION_FN and not fast_tier:
         try:
             decision_agent_out = _call_decision_agent(log_doc) or {}
         except Exception:
@@ -612,17 +810,7 @@ def handler(event, context):
 
     # 8) Persist run document to S3
     if DECISIONS_BUCKET:
-        try:
-            S3.put_object(
-                Bucket=DECISIONS_BUCKET,
-                Key=key,
-                Body=json.dumps(log_doc, ensure_ascii=False).encode("utf-8"),
-                ContentType="application/json",
-            )
-            # Enqueue HITL item if needed
-            enqueue_hitl_if_needed(log_doc, DECISIONS_BUCKET, key)
-        except Exception:
-            log.exception("failed to write run document to S3")
+        _persist_run(log_doc, key)
 
     # 9) Emit CloudWatch metrics
     _emit_metrics(decision, classification, has_phi, elapsed_ms)